@@ -1,7 +1,7 @@
 # import the libraries
 import streamlit as st
 import hashlib
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 import sys
 print(sys.executable)
@@ -11,8 +11,12 @@ print(sys.executable)
 from wofofiles.globfuncs import get_app_title
 # import the menu
 from wofofiles.menu import app_menu
-# import the database connection
-from wofofiles.conn import username, password, host, port, database
+# import the shared database engine
+from wofofiles.db import get_engine
+# import the background warm-up of datasets and report caches
+from pages.reports.registry import start_report_warmup
+# import the timings recorder
+from wofofiles.perf import rerun
 
 # page config
 st.set_page_config(
@@ -21,15 +25,16 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Create a connection string for the MySQL database
-connection_string = f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
-
-# Create the SQLAlchemy engine to interact with the database
+# Get the shared SQLAlchemy engine to interact with the database
 try:
-    engine = create_engine(connection_string, echo=True)
+    engine = get_engine()
 except SQLAlchemyError as e:
     st.error(f"Failed to connect to the database: {e}")
 
+# Keep datasets and report caches warm in the background, once per server process
+# (MEERKAT_WARMUP_SECONDS=0 turns it off, e.g. when python -m wofofiles.warmup runs instead)
+start_report_warmup()
+
 # Hashing the password
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -118,5 +123,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # the login and home page reruns are shown on the Monitor page too
+    with rerun("Home", st.session_state.get("user_code")):
+        main()
 
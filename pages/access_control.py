@@ -3,7 +3,7 @@ import streamlit as st
 import pandas as pd
 import os
 import hashlib
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 # Local imports
@@ -11,8 +11,16 @@ from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from wofofiles.globfuncs import get_app_title
 # import the menu
 from wofofiles.menu import app_menu
-# import the database connection
-from wofofiles.conn import username, password, host, port, database
+# import the shared database engine
+from wofofiles.db import get_engine
+# import the cached user permissions
+from wofofiles.auth import get_permissions, invalidate_permissions, primary_group, is_admin
+# import the grid paging helpers
+from wofofiles.paging import search_box, fetch_page, editor_key
+# import the batched grid writes
+from wofofiles.batch import deleted_rows, changed_labels, inserted_rows, update_params, key_params, apply_batches, format_summary
+# import the timings recorder
+from wofofiles.perf import rerun
 import pandas as pd
 
 # Page config
@@ -22,9 +30,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Create a connection string for the MySQL database
-connection_string = f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
-engine = create_engine(connection_string, echo=True)
+# Get the shared SQLAlchemy engine to interact with the database
+engine = get_engine()
 
 # Hashing the password
 def hash_password(password):
@@ -47,6 +54,7 @@ def users_page():
                         insert_query = text("INSERT INTO users (UserCode, UserName, Password) VALUES (:user_code, :user_name, :password)")
                         connection.execute(insert_query, {'user_code': user_code, 'user_name': user_name, 'password': hashed_password})
                         st.success(f"User '{user_name}' added successfully!")
+                        data_changed()
                 except IntegrityError:
                     st.error(f"Failed to add user: User code '{user_code}' already exists.")
                 except SQLAlchemyError as e:
@@ -54,11 +62,17 @@ def users_page():
             else:
                 st.warning("Please enter all user details before adding.")
 
-    # View existing users as a table
+    # View existing users as a table, one page at a time
+    search = search_box("users")
     try:
         with engine.connect() as connection:
-            result = connection.execute(text("SELECT UserCode, UserName FROM users"))
-            users = result.fetchall()
+            users = fetch_page(
+                connection,
+                "SELECT UserCode, UserName FROM users WHERE UserName LIKE :search OR CAST(UserCode AS CHAR) LIKE :search ORDER BY UserCode",
+                "SELECT COUNT(*) FROM users WHERE UserName LIKE :search OR CAST(UserCode AS CHAR) LIKE :search",
+                {'search': search},
+                "users"
+            )
             if users:
                 df = pd.DataFrame(users, columns=["User Code", "User Name"])
 
@@ -76,44 +90,36 @@ def users_page():
                         "Change Password": st.column_config.CheckboxColumn("Change Password"),
                     },
                     hide_index=True,
-                    key="editable_users",
+                    key=editor_key("users"),
                     use_container_width=True
                 )
 
-                # Handle edits
-                if st.button("Update ↻"):
-                    for idx, row in edited_df.iterrows():
-                        original = df.iloc[idx]
-                        if row["User Code"] != original["User Code"] or row["User Name"] != original["User Name"]:
-                            try:
-                                update_query = text(""" 
-                                    UPDATE users 
-                                    SET UserCode = :new_user_code, UserName = :new_user_name 
-                                    WHERE UserCode = :original_user_code
-                                """)
-                                params = {
-                                    'new_user_code': row["User Code"],
-                                    'new_user_name': row["User Name"],
-                                    'original_user_code': original["User Code"]
-                                }
-                                with engine.begin() as connection:
-                                    connection.execute(update_query, params)
-                                st.success(f"User '{original['User Code']}' updated successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to update user: {str(e.__dict__['orig'])}")
-
-                # Handle deletion
-                rows_to_delete = edited_df[edited_df["Delete"] == True]
-                if not rows_to_delete.empty:
-                    if st.button("Delete ✖"):
-                        for _, row in rows_to_delete.iterrows():
-                            try:
-                                with engine.begin() as connection:
-                                    delete_query = text("DELETE FROM users WHERE UserCode = :user_code")
-                                    connection.execute(delete_query, {'user_code': row["User Code"]})
-                                st.success(f"User '{row['User Code']}' deleted successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to delete user: {str(e.__dict__['orig'])}")
+                # Handle edits: deleted and changed rows are saved together in a single transaction
+                # (new users need a password, so they are added from the popover above)
+                if st.button("Save ↻"):
+                    changed = changed_labels(df, edited_df, ["User Code", "User Name"])
+                    batches = [
+                        ("deleted", text("DELETE FROM users WHERE UserCode = :user_code"),
+                         key_params(deleted_rows(df, edited_df), {'user_code': "User Code"})),
+                        ("updated", text("""
+                            UPDATE users
+                            SET UserCode = :new_user_code, UserName = :new_user_name
+                            WHERE UserCode = :original_user_code
+                        """), update_params(
+                            df, edited_df, changed,
+                            new_columns={
+                                'new_user_code': "User Code",
+                                'new_user_name': "User Name"
+                            },
+                            key_columns={'original_user_code': "User Code"}
+                        ))
+                    ]
+                    try:
+                        summary = apply_batches(engine, batches)
+                        st.success(f"Users saved: {format_summary(summary)}.")
+                        data_changed()
+                    except SQLAlchemyError as e:
+                        st.error(f"Failed to save users: {str(e.__dict__['orig'])}")
 
                 # Handle password change
                 rows_to_change_password = edited_df[edited_df["Change Password"] == True]
@@ -157,6 +163,7 @@ def groups_page():
                         insert_query = text("INSERT INTO `groups` (GroupCode, GroupName) VALUES (:group_code, :group_name)")
                         connection.execute(insert_query, {'group_code': group_code, 'group_name': group_name})
                         st.success(f"Group '{group_name}' added successfully!")
+                        data_changed()
                 except IntegrityError:
                     st.error(f"Failed to add group: Group code '{group_code}' already exists.")
                 except SQLAlchemyError as e:
@@ -164,11 +171,17 @@ def groups_page():
             else:
                 st.warning("Please enter all group details before adding.")
 
-    # View existing groups as a table
+    # View existing groups as a table, one page at a time
+    search = search_box("groups")
     try:
         with engine.connect() as connection:
-            result = connection.execute(text("SELECT GroupCode, GroupName FROM `groups`"))
-            groups = result.fetchall()
+            groups = fetch_page(
+                connection,
+                "SELECT GroupCode, GroupName FROM `groups` WHERE GroupName LIKE :search OR CAST(GroupCode AS CHAR) LIKE :search ORDER BY GroupCode",
+                "SELECT COUNT(*) FROM `groups` WHERE GroupName LIKE :search OR CAST(GroupCode AS CHAR) LIKE :search",
+                {'search': search},
+                "groups"
+            )
             if groups:
                 df = pd.DataFrame(groups, columns=["Group Code", "Group Name"])
 
@@ -184,44 +197,38 @@ def groups_page():
                         "Group Name": st.column_config.TextColumn("Group Name"),
                     },
                     hide_index=True,
-                    key="editable_groups",
+                    num_rows="dynamic",
+                    key=editor_key("groups"),
                     use_container_width=True
                 )
 
-                # Handle edits
-                if st.button("Update ↻"):
-                    for idx, row in edited_df.iterrows():
-                        original = df.iloc[idx]
-                        if row["Group Code"] != original["Group Code"] or row["Group Name"] != original["Group Name"]:
-                            try:
-                                update_query = text(""" 
-                                    UPDATE `groups` 
-                                    SET GroupCode = :new_group_code, GroupName = :new_group_name 
-                                    WHERE GroupCode = :original_group_code
-                                """)
-                                params = {
-                                    'new_group_code': row["Group Code"],
-                                    'new_group_name': row["Group Name"],
-                                    'original_group_code': original["Group Code"]
-                                }
-                                with engine.begin() as connection:
-                                    connection.execute(update_query, params)
-                                st.success(f"Group '{original['Group Code']}' updated successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to update group: {str(e.__dict__['orig'])}")
-
-                # Handle deletion
-                rows_to_delete = edited_df[edited_df["Delete"] == True]
-                if not rows_to_delete.empty:
-                    if st.button("Delete ✖"):
-                        for _, row in rows_to_delete.iterrows():
-                            try:
-                                with engine.begin() as connection:
-                                    delete_query = text("DELETE FROM `groups` WHERE GroupCode = :group_code")
-                                    connection.execute(delete_query, {'group_code': row["Group Code"]})
-                                st.success(f"Group '{row['Group Code']}' deleted successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to delete group: {str(e.__dict__['orig'])}")
+                # Handle edits: deleted, changed and added rows are saved together in a single transaction
+                if st.button("Save ↻"):
+                    changed = changed_labels(df, edited_df, ["Group Code", "Group Name"])
+                    batches = [
+                        ("deleted", text("DELETE FROM `groups` WHERE GroupCode = :group_code"),
+                         key_params(deleted_rows(df, edited_df), {'group_code': "Group Code"})),
+                        ("updated", text("""
+                            UPDATE `groups`
+                            SET GroupCode = :new_group_code, GroupName = :new_group_name
+                            WHERE GroupCode = :original_group_code
+                        """), update_params(
+                            df, edited_df, changed,
+                            new_columns={
+                                'new_group_code': "Group Code",
+                                'new_group_name': "Group Name"
+                            },
+                            key_columns={'original_group_code': "Group Code"}
+                        )),
+                        ("inserted", text("INSERT INTO `groups` (GroupCode, GroupName) VALUES (:group_code, :group_name)"),
+                         key_params(inserted_rows(df, edited_df, ["Group Code", "Group Name"]), {'group_code': "Group Code", 'group_name': "Group Name"}))
+                    ]
+                    try:
+                        summary = apply_batches(engine, batches)
+                        st.success(f"Groups saved: {format_summary(summary)}.")
+                        data_changed()
+                    except SQLAlchemyError as e:
+                        st.error(f"Failed to save groups: {str(e.__dict__['orig'])}")
 
             else:
                 st.write("No groups found.")
@@ -243,6 +250,7 @@ def sections_page():
                         insert_query = text("INSERT INTO sections (SectionCode, SectionName) VALUES (:section_code, :section_name)")
                         connection.execute(insert_query, {'section_code': section_code, 'section_name': section_name})
                         st.success(f"Section '{section_name}' added successfully!")
+                        data_changed()
                 except IntegrityError:
                     st.error(f"Failed to add section: Section code '{section_code}' already exists.")
                 except SQLAlchemyError as e:
@@ -250,11 +258,17 @@ def sections_page():
             else:
                 st.warning("Please enter all section details before adding.")
 
-    # View existing sections as a table
+    # View existing sections as a table, one page at a time
+    search = search_box("sections")
     try:
         with engine.connect() as connection:
-            result = connection.execute(text("SELECT SectionCode, SectionName FROM sections"))
-            sections = result.fetchall()
+            sections = fetch_page(
+                connection,
+                "SELECT SectionCode, SectionName FROM sections WHERE SectionName LIKE :search OR CAST(SectionCode AS CHAR) LIKE :search ORDER BY SectionCode",
+                "SELECT COUNT(*) FROM sections WHERE SectionName LIKE :search OR CAST(SectionCode AS CHAR) LIKE :search",
+                {'search': search},
+                "sections"
+            )
             if sections:
                 df = pd.DataFrame(sections, columns=["Section Code", "Section Name"])
 
@@ -270,44 +284,38 @@ def sections_page():
                         "Section Name": st.column_config.TextColumn("Section Name"),
                     },
                     hide_index=True,
-                    key="editable_sections",
+                    num_rows="dynamic",
+                    key=editor_key("sections"),
                     use_container_width=True
                 )
 
-                # Handle edits
-                if st.button("Update ↻"):
-                    for idx, row in edited_df.iterrows():
-                        original = df.iloc[idx]
-                        if row["Section Code"] != original["Section Code"] or row["Section Name"] != original["Section Name"]:
-                            try:
-                                update_query = text(""" 
-                                    UPDATE sections 
-                                    SET SectionCode = :new_section_code, SectionName = :new_section_name 
-                                    WHERE SectionCode = :original_section_code
-                                """)
-                                params = {
-                                    'new_section_code': row["Section Code"],
-                                    'new_section_name': row["Section Name"],
-                                    'original_section_code': original["Section Code"]
-                                }
-                                with engine.begin() as connection:
-                                    connection.execute(update_query, params)
-                                st.success(f"Section '{original['Section Code']}' updated successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to update section: {str(e.__dict__['orig'])}")
-
-                # Handle deletion
-                rows_to_delete = edited_df[edited_df["Delete"] == True]
-                if not rows_to_delete.empty:
-                    if st.button("Delete ✖"):
-                        for _, row in rows_to_delete.iterrows():
-                            try:
-                                with engine.begin() as connection:
-                                    delete_query = text("DELETE FROM sections WHERE SectionCode = :section_code")
-                                    connection.execute(delete_query, {'section_code': row["Section Code"]})
-                                st.success(f"Section '{row['Section Code']}' deleted successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to delete section: {str(e.__dict__['orig'])}")
+                # Handle edits: deleted, changed and added rows are saved together in a single transaction
+                if st.button("Save ↻"):
+                    changed = changed_labels(df, edited_df, ["Section Code", "Section Name"])
+                    batches = [
+                        ("deleted", text("DELETE FROM sections WHERE SectionCode = :section_code"),
+                         key_params(deleted_rows(df, edited_df), {'section_code': "Section Code"})),
+                        ("updated", text("""
+                            UPDATE sections
+                            SET SectionCode = :new_section_code, SectionName = :new_section_name
+                            WHERE SectionCode = :original_section_code
+                        """), update_params(
+                            df, edited_df, changed,
+                            new_columns={
+                                'new_section_code': "Section Code",
+                                'new_section_name': "Section Name"
+                            },
+                            key_columns={'original_section_code': "Section Code"}
+                        )),
+                        ("inserted", text("INSERT INTO sections (SectionCode, SectionName) VALUES (:section_code, :section_name)"),
+                         key_params(inserted_rows(df, edited_df, ["Section Code", "Section Name"]), {'section_code': "Section Code", 'section_name': "Section Name"}))
+                    ]
+                    try:
+                        summary = apply_batches(engine, batches)
+                        st.success(f"Sections saved: {format_summary(summary)}.")
+                        data_changed()
+                    except SQLAlchemyError as e:
+                        st.error(f"Failed to save sections: {str(e.__dict__['orig'])}")
 
             else:
                 st.write("No sections found.")
@@ -330,6 +338,7 @@ def pages_page():
                         insert_query = text("INSERT INTO pages (PageRef, PageName) VALUES (:page_ref, :page_name)")
                         connection.execute(insert_query, {'page_ref': page_ref, 'page_name': page_name})
                         st.success(f"Page '{page_name}' added successfully!")
+                        data_changed()
                 except IntegrityError:
                     st.error(f"Failed to add page: Page reference '{page_ref}' already exists.")
                 except SQLAlchemyError as e:
@@ -337,12 +346,17 @@ def pages_page():
             else:
                 st.warning("Please enter all page details before adding.")
 
-    # View existing pages as a table
-
+    # View existing pages as a table, one page at a time
+    search = search_box("pages")
     try:
         with engine.connect() as connection:
-            result = connection.execute(text("SELECT PageRef, PageName FROM pages"))
-            pages = result.fetchall()
+            pages = fetch_page(
+                connection,
+                "SELECT PageRef, PageName FROM pages WHERE PageName LIKE :search OR PageRef LIKE :search ORDER BY PageRef",
+                "SELECT COUNT(*) FROM pages WHERE PageName LIKE :search OR PageRef LIKE :search",
+                {'search': search},
+                "pages"
+            )
             if pages:
                 df = pd.DataFrame(pages, columns=["Page Reference", "Page Name"])
 
@@ -358,64 +372,70 @@ def pages_page():
                         "Page Name": st.column_config.TextColumn("Page Name"),
                     },
                     hide_index=True,
-                    key="editable_pages",
+                    num_rows="dynamic",
+                    key=editor_key("pages"),
                     use_container_width=True
                 )
 
-                # Handle edits
-                if st.button("Update ↻"):
-                    for idx, row in edited_df.iterrows():
-                        original = df.iloc[idx]
-                        if row["Page Reference"] != original["Page Reference"] or row["Page Name"] != original["Page Name"]:
-                            try:
-                                with engine.begin() as connection:
-                                    update_query = text("""
-                                        UPDATE pages 
-                                        SET PageRef = :new_page_ref, PageName = :new_page_name 
-                                        WHERE PageRef = :original_page_ref
-                                    """)
-                                    connection.execute(update_query, {
-                                        'new_page_ref': row["Page Reference"],
-                                        'new_page_name': row["Page Name"],
-                                        'original_page_ref': original["Page Reference"]
-                                    })
-                                st.success(f"Page '{original['Page Reference']}' updated successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to update page: {str(e.__dict__['orig'])}")
-
-                # Handle deletion
-                rows_to_delete = edited_df[edited_df["Delete"] == True]
-                if not rows_to_delete.empty:
-                    if st.button("Delete ✖"):
-                        for _, row in rows_to_delete.iterrows():
-                            try:
-                                with engine.begin() as connection:
-                                    delete_query = text("DELETE FROM pages WHERE PageRef = :page_ref")
-                                    connection.execute(delete_query, {'page_ref': row["Page Reference"]})
-                                st.success(f"Page '{row['Page Reference']}' deleted successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to delete page: {str(e.__dict__['orig'])}")
+                # Handle edits: deleted, changed and added rows are saved together in a single transaction
+                if st.button("Save ↻"):
+                    changed = changed_labels(df, edited_df, ["Page Reference", "Page Name"])
+                    batches = [
+                        ("deleted", text("DELETE FROM pages WHERE PageRef = :page_ref"),
+                         key_params(deleted_rows(df, edited_df), {'page_ref': "Page Reference"})),
+                        ("updated", text("""
+                            UPDATE pages
+                            SET PageRef = :new_page_ref, PageName = :new_page_name
+                            WHERE PageRef = :original_page_ref
+                        """), update_params(
+                            df, edited_df, changed,
+                            new_columns={
+                                'new_page_ref': "Page Reference",
+                                'new_page_name': "Page Name"
+                            },
+                            key_columns={'original_page_ref': "Page Reference"}
+                        )),
+                        ("inserted", text("INSERT INTO pages (PageRef, PageName) VALUES (:page_ref, :page_name)"),
+                         key_params(inserted_rows(df, edited_df, ["Page Reference", "Page Name"]), {'page_ref': "Page Reference", 'page_name': "Page Name"}))
+                    ]
+                    try:
+                        summary = apply_batches(engine, batches)
+                        st.success(f"Pages saved: {format_summary(summary)}.")
+                        data_changed()
+                    except SQLAlchemyError as e:
+                        st.error(f"Failed to save pages: {str(e.__dict__['orig'])}")
+
             else:
                 st.write("No pages found.")
     except SQLAlchemyError as e:
         st.error(f"Failed to retrieve pages: {str(e.__dict__['orig'])}")
 
+# Options for the permission dropdowns, cached until the next write on this page
+@st.cache_data(ttl=600, show_spinner=False)
+def load_options():
+    with engine.connect() as connection:
+        users = connection.execute(text("SELECT UserCode, UserName FROM users")).fetchall()
+        groups = connection.execute(text("SELECT GroupCode, GroupName FROM `groups`")).fetchall()
+        sections = connection.execute(text("SELECT SectionCode, SectionName FROM sections")).fetchall()
+        pages = connection.execute(text("SELECT PageRef, PageName FROM pages")).fetchall()
+
+    # Create dictionaries for dropdowns
+    user_options = {f"{user.UserName} ({user.UserCode})": user.UserCode for user in users}
+    group_options = {"None": None} | {group.GroupName: group.GroupCode for group in groups}
+    section_options = {"None": None} | {section.SectionName: section.SectionCode for section in sections}
+    page_options = {page.PageName: page.PageRef for page in pages}
+    return user_options, group_options, section_options, page_options
+
+# Drop the cached permissions and dropdown options after a write
+def data_changed():
+    invalidate_permissions()
+    load_options.clear()
+
 # Creating CRUD for the users access control
 def access_control_page():
     # Load all options for dropdowns
     try:
-        with engine.connect() as connection:
-            users = connection.execute(text("SELECT UserCode, UserName FROM users")).fetchall()
-            groups = connection.execute(text("SELECT GroupCode, GroupName FROM `groups`")).fetchall()
-            sections = connection.execute(text("SELECT SectionCode, SectionName FROM sections")).fetchall()
-            pages = connection.execute(text("SELECT PageRef, PageName FROM pages")).fetchall()
-
-            # Create dictionaries for dropdowns
-            user_options = {f"{user.UserName} ({user.UserCode})": user.UserCode for user in users}
-            group_options = {"None": None} | {group.GroupName: group.GroupCode for group in groups}
-            section_options = {"None": None} | {section.SectionName: section.SectionCode for section in sections}
-            page_options = {page.PageName: page.PageRef for page in pages}
-
+        user_options, group_options, section_options, page_options = load_options()
     except SQLAlchemyError as e:
         st.error(f"Failed to load options: {str(e.__dict__['orig'])}")
         return
@@ -442,6 +462,7 @@ def access_control_page():
                             'page_ref': page_options[selected_page]
                         })
                         st.success("Access control added successfully!")
+                        data_changed()
                 except IntegrityError:
                     st.error("Failed to add access control : Integrity error.")
                 except SQLAlchemyError as e:
@@ -449,19 +470,31 @@ def access_control_page():
             else:
                 st.warning("Please select all required details before adding.")
 
-    # View existing access control entries as a table
-    try:
-        with engine.connect() as connection:
-            query = text("""
-                SELECT ac.UserCode, u.UserName, ac.GroupCode, g.GroupName, 
-                       ac.SectionCode, s.SectionName, ac.PageRef, p.PageName
+    # View existing access control entries as a table, one page at a time
+    search = search_box("access_control")
+    joins = """
                 FROM access_control ac
                 JOIN users u ON ac.UserCode = u.UserCode
                 LEFT JOIN `groups` g ON ac.GroupCode = g.GroupCode
                 LEFT JOIN sections s ON ac.SectionCode = s.SectionCode
                 LEFT JOIN pages p ON ac.PageRef = p.PageRef
-            """)
-            entries = connection.execute(query).fetchall()
+                WHERE u.UserName LIKE :search OR CAST(ac.UserCode AS CHAR) LIKE :search
+                OR g.GroupName LIKE :search OR s.SectionName LIKE :search OR p.PageName LIKE :search
+    """
+    try:
+        with engine.connect() as connection:
+            entries = fetch_page(
+                connection,
+                f"""
+                SELECT ac.UserCode, u.UserName, ac.GroupCode, g.GroupName,
+                       ac.SectionCode, s.SectionName, ac.PageRef, p.PageName
+                {joins}
+                ORDER BY ac.UserCode, ac.PageRef
+                """,
+                f"SELECT COUNT(*) {joins}",
+                {'search': search},
+                "access_control"
+            )
             if entries:
                 df = pd.DataFrame(entries, columns=["User Code", "User Name", "Group Code", "Group Name", "Section Code", "Section Name", "Page Ref", "Page Name"])
 
@@ -482,49 +515,58 @@ def access_control_page():
                         "Page Name": st.column_config.SelectboxColumn("Page Name", options=list(page_options.keys())),
                     },
                     hide_index=True,
-                    key="editable_access_control",
+                    num_rows="dynamic",
+                    key=editor_key("access_control"),
                     use_container_width=True
                 )
 
-                # Handle edits
-                if st.button("Update ↻"):
-                    for idx, row in edited_df.iterrows():
-                        original = df.iloc[idx]
-                        if (row["User Display"] != original["User Display"] or row["Group Name"] != original["Group Name"] or
-                            row["Section Name"] != original["Section Name"] or row["Page Name"] != original["Page Name"]):
-                            try:
-                                update_query = text("""
-                                    UPDATE access_control 
-                                    SET UserCode = :new_user_code, GroupCode = :new_group_code, 
-                                        SectionCode = :new_section_code, PageRef = :new_page_ref 
-                                    WHERE UserCode = :original_user_code AND PageRef = :original_page_ref
-                                """)
-                                params = {
-                                    'new_user_code': user_options[row["User Display"]],
-                                    'new_group_code': group_options[row["Group Name"]],
-                                    'new_section_code': section_options[row["Section Name"]],
-                                    'new_page_ref': page_options[row["Page Name"]],
-                                    'original_user_code': original["User Code"],
-                                    'original_page_ref': original["Page Ref"]
-                                }
-                                with engine.begin() as connection:
-                                    connection.execute(update_query, params)
-                                st.success(f"Access control entry for User '{original['User Name']}' updated successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to update access control entry: {str(e.__dict__['orig'])}")
-
-                # Handle deletion
-                rows_to_delete = edited_df[edited_df["Delete"] == True]
-                if not rows_to_delete.empty:
-                    if st.button("Delete ✖"):
-                        for _, row in rows_to_delete.iterrows():
-                            try:
-                                with engine.begin() as connection:
-                                    delete_query = text("DELETE FROM access_control WHERE UserCode = :user_code AND PageRef = :page_ref")
-                                    connection.execute(delete_query, {'user_code': user_options[row["User Display"]], 'page_ref': page_options[row["Page Name"]]})
-                                st.success(f"Access control entry for User '{row['User Display']}' deleted successfully!")
-                            except SQLAlchemyError as e:
-                                st.error(f"Failed to delete access control entry: {str(e.__dict__['orig'])}")
+                # Map the edited display names back to codes in one vectorized pass
+                edited_codes = pd.DataFrame({
+                    "User Code": edited_df["User Display"].map(user_options),
+                    "Group Code": edited_df["Group Name"].map(group_options),
+                    "Section Code": edited_df["Section Name"].map(section_options),
+                    "Page Ref": edited_df["Page Name"].map(page_options)
+                })
+
+                # Handle edits: deleted, changed and added rows are saved together in a single transaction
+                if st.button("Save ↻"):
+                    display_columns = ["User Display", "Group Name", "Section Name", "Page Name"]
+                    changed = changed_labels(df, edited_df, display_columns)
+                    added = inserted_rows(df, edited_df, display_columns)
+                    batches = [
+                        ("deleted", text("DELETE FROM access_control WHERE UserCode = :user_code AND PageRef = :page_ref"),
+                         key_params(deleted_rows(df, edited_df), {'user_code': "User Code", 'page_ref': "Page Ref"})),
+                        ("updated", text("""
+                            UPDATE access_control
+                            SET UserCode = :new_user_code, GroupCode = :new_group_code,
+                                SectionCode = :new_section_code, PageRef = :new_page_ref
+                            WHERE UserCode = :original_user_code AND PageRef = :original_page_ref
+                        """), update_params(
+                            df, edited_codes, changed,
+                            new_columns={
+                                'new_user_code': "User Code",
+                                'new_group_code': "Group Code",
+                                'new_section_code': "Section Code",
+                                'new_page_ref': "Page Ref"
+                            },
+                            key_columns={'original_user_code': "User Code", 'original_page_ref': "Page Ref"}
+                        )),
+                        ("inserted", text("""
+                            INSERT INTO access_control (UserCode, GroupCode, SectionCode, PageRef)
+                            VALUES (:user_code, :group_code, :section_code, :page_ref)
+                        """), key_params(edited_codes.loc[added.index], {
+                            'user_code': "User Code",
+                            'group_code': "Group Code",
+                            'section_code': "Section Code",
+                            'page_ref': "Page Ref"
+                        }))
+                    ]
+                    try:
+                        summary = apply_batches(engine, batches)
+                        st.success(f"Access control saved: {format_summary(summary)}.")
+                        data_changed()
+                    except SQLAlchemyError as e:
+                        st.error(f"Failed to save access control entries: {str(e.__dict__['orig'])}")
 
             else:
                 st.write("No access control entries found.")
@@ -554,23 +596,14 @@ def main():
     # Check if the user is logged in
     if st.session_state.get('logged_in'):
         try:
-            with engine.connect() as connection:
-                user_group_query = text("""
-                    SELECT g.GroupName 
-                    FROM users u
-                    JOIN access_control ac ON u.UserCode = ac.UserCode
-                    JOIN `groups` g ON ac.GroupCode = g.GroupCode
-                    WHERE u.UserCode = :user_code
-                """)
-                result = connection.execute(user_group_query, {'user_code': st.session_state.get('user_code')}).fetchone()
-                user_group = result.GroupName if result else None
-                st.session_state['user_group'] = user_group
+            permissions = get_permissions(st.session_state.get('user_code'))
+            st.session_state['user_group'] = primary_group(permissions)
         except SQLAlchemyError as e:
             st.error(f"Failed to retrieve user group: {str(e.__dict__['orig'])}")
             return
 
         # Check user access to the MAC page if the group is admin
-        if st.session_state.get('user_group') == 'Admin':
+        if is_admin(permissions):
             mac_page()
         else:
             st.warning("You do not have permission to access this page.")
@@ -585,4 +618,6 @@ def main():
         st.stop()  # Stops execution if not logged in
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # every span of this rerun (paged queries, batched writes) is shown on the Monitor page
+    with rerun("Access control", st.session_state.get("user_code")):
+        main()
\ No newline at end of file
@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import openai
 
 # local imports
@@ -7,57 +6,93 @@ import openai
 from wofofiles.globfuncs import get_app_title
 # import the menu
 from wofofiles.menu import app_menu
-# import the database connection
-
-# import the data from the xlsx file from drafts folder
-df = pd.read_excel('draft/data_sample.xlsx')
-# remove the columns that are not needed TRNS_TYPE_CODE, TRNS_SERIAL, INSERT_USER, STORE_CODE, CUSTOMER_CODE, ITEM_GROUP_CODE, ITEM_CODE, ITEM_NAME
-df.drop(['TRNS_TYPE_CODE', 'TRNS_SERIAL', 'INSERT_USER', 'STORE_CODE', 'CUSTOMER_CODE', 'ITEM_GROUP_CODE', 'ITEM_CODE', 'ITEM_NAME'], axis=1, inplace=True)
-# fill null values with "Walk-in" in the column CUSTOMER_NAME
-df['CUSTOMER_NAME'].fillna('Walk-in', inplace=True)
-# fill null values with 0 in the column LIST_RATE
-df['LIST_RATE'].fillna(0, inplace=True) 
-
-# Streamlit App Layout
-st.title("Streamlit App with ChatGPT API Integration")
-
-st.subheader("DataFrame")
-#st.dataframe(df)
-
-# Input Section
-st.subheader("Query ChatGPT")
-query = st.text_area("Enter your query related to the DataFrame or anything else:")
-
-if st.button("Send Query"):
-    if query.strip():
-        with st.spinner("Processing your query..."):
-            try:
-                # Send the query to ChatGPT
-                client = openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-                response = client.chat.completions.create(
-                    model="gpt-4o",  # Specify the model version
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant."},
-                        {"role": "user", "content": f"Here's the data: {df.to_dict()}. {query}"}
-                    ],
-                    max_tokens=150
-                )
-
-                # Extract and display the response
-                chat_response = response.choices[0].message.content.strip()
-                st.success("Response from ChatGPT:")
-                st.write(chat_response)
-
-            except openai.APIError as e:
-                if "insufficient_quota" in str(e):
-                    st.error("OpenAI API quota exceeded. Please check your billing details or try again later.")
-                else:
-                    st.error(f"An error occurred with the OpenAI API: {e}")
-            except Exception as e:
-                st.error(f"An unexpected error occurred: {e}")
-    else:
-        st.warning("Please enter a query before clicking the button.")
+# import the data sources
+from wofofiles.df_src import get_dataset
+from wofofiles.snapshot import snapshot_version
+# import the chat data context builder
+from wofofiles.chat_context import build_data_context, default_token_budget
+# import the local query plan runner
+from wofofiles.chat_plan import plan_and_run, describe_result, PlanError
+# import the pooled client and answer cache
+from wofofiles.chat_client import get_client, answer_key, get_cached_answer, put_cached_answer, stream_text
+# import the timings recorder
+from wofofiles.perf import rerun
+
+# Specify the model version
+chat_model = "gpt-4o"
+# size of the data context sent with each question
+context_token_budget = int(st.secrets.get("CHAT_CONTEXT_TOKENS", default_token_budget))
+
+
+# The chat page: question box, local plan or data context, streamed answer
+def chat_page():
+    # the typed transactions data, without the code columns
+    df = get_dataset('returns_report')
+
+    # Streamlit App Layout
+    st.title("Streamlit App with ChatGPT API Integration")
+
+    st.subheader("DataFrame")
+    #st.dataframe(df)
+
+    # Input Section
+    st.subheader("Query ChatGPT")
+    query = st.text_area("Enter your query related to the DataFrame or anything else:")
+
+    # Local answers: the model writes a query plan, the plan runs here and only its result goes back
+    use_local_plan = st.checkbox("Answer from local data", value=True)
+
+    if st.button("Send Query"):
+        if query.strip():
+            with st.spinner("Processing your query..."):
+                try:
+                    # one pooled client per process instead of a new one per question
+                    client = get_client(st.secrets["OPENAI_API_KEY"])
+                    version = snapshot_version('transactions')
+                    cache_key = answer_key(query, version, "plan" if use_local_plan else "context", chat_model)
+                    cached_response = get_cached_answer(cache_key)
+
+                    if cached_response is not None:
+                        # the same question on the same data was answered before
+                        st.success("Response from ChatGPT (cached):")
+                        st.write(cached_response)
+                    elif use_local_plan:
+                        plan, result = plan_and_run(client, df, version, query, model=chat_model)
+                        st.success("Response from ChatGPT:")
+                        chat_response = st.write_stream(stream_text(describe_result(client, query, result, model=chat_model, stream=True)))
+                        put_cached_answer(cache_key, chat_response, query)
+                        with st.expander("Query plan and result"):
+                            st.json(plan)
+                            st.dataframe(result)
+                    else:
+                        # A compact summary of the data, cached per dataset version, instead of the whole table
+                        data_context = build_data_context(df, version, question=query, token_budget=context_token_budget)
+
+                        # Send the query to ChatGPT and render the answer as it streams in
+                        response = client.chat.completions.create(
+                            model=chat_model,
+                            messages=[
+                                {"role": "system", "content": "You are a helpful assistant."},
+                                {"role": "user", "content": f"Here's a summary of the data:\n{data_context}\n\n{query}"}
+                            ],
+                            max_tokens=150,
+                            stream=True
+                        )
+                        st.success("Response from ChatGPT:")
+                        chat_response = st.write_stream(stream_text(response))
+                        put_cached_answer(cache_key, chat_response, query)
 
+                except PlanError as e:
+                    st.error(f"Could not answer from the local data: {e}")
+                except openai.APIError as e:
+                    if "insufficient_quota" in str(e):
+                        st.error("OpenAI API quota exceeded. Please check your billing details or try again later.")
+                    else:
+                        st.error(f"An error occurred with the OpenAI API: {e}")
+                except Exception as e:
+                    st.error(f"An unexpected error occurred: {e}")
+        else:
+            st.warning("Please enter a query before clicking the button.")
 
 
 # Display the MAC page if this script is run
@@ -76,5 +111,8 @@ def main():
         st.stop()  # Stops execution if not logged in
 
 if __name__ == "__main__":
-    main()
+    # this rerun, with the dataset load and the time spent waiting on the model, is shown on the Monitor page
+    with rerun("Chat", st.session_state.get("user_code")):
+        chat_page()
+        main()
 
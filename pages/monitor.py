@@ -0,0 +1,130 @@
+# import the libraries
+import time
+import streamlit as st
+import pandas as pd
+from sqlalchemy.exc import SQLAlchemyError
+
+# local imports
+# import the page title
+from wofofiles.globfuncs import get_app_title
+# import the menu
+from wofofiles.menu import app_menu
+# import the cached user permissions
+from wofofiles.auth import get_permissions, is_admin
+# import the recorded timings and the caches they explain
+from wofofiles.perf import rerun, recent_reruns, recent_spans, span_summary, clear_spans, perf_log_path
+from wofofiles.db import pool_stats
+from wofofiles.df_src import dataset_stats, get_dataset, memory_report
+from wofofiles.result_cache import result_cache_stats
+from wofofiles.warmup import warmup_status
+
+# page config
+st.set_page_config(
+    page_title=get_app_title(),
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)) if timestamp else ""
+
+
+# Latest page reruns and the spans measured during the selected one
+def reruns_section():
+    st.write("### Page reruns")
+    reruns = list(reversed(recent_reruns(50)))
+    if not reruns:
+        st.info("No page reruns recorded yet. Open any page to collect timings.")
+        return
+    st.dataframe(pd.DataFrame([{
+        'Started': format_time(item['started_at']),
+        'Page': item['page'],
+        'User': item['user'],
+        'Seconds': round(item['seconds'], 3),
+        'Spans': len(item['spans'])
+    } for item in reruns]), use_container_width=True)
+
+    selected = st.selectbox("Rerun", range(len(reruns)),
+                            format_func=lambda i: f"{format_time(reruns[i]['started_at'])} {reruns[i]['page']} "
+                                                  f"({reruns[i]['seconds']:.2f}s)")
+    spans = reruns[selected]['spans']
+    if spans:
+        spans_df = pd.DataFrame(spans)
+        spans_df['started_at'] = spans_df['started_at'].map(format_time)
+        st.dataframe(spans_df[['started_at', 'kind', 'name', 'seconds', 'error']], use_container_width=True)
+
+
+# Where the time goes, over every span still in memory (background threads included)
+def summary_section():
+    st.write("### Time by operation")
+    kinds = st.multiselect("Kinds", ['query', 'load', 'aggregation', 'render', 'report'], default=[])
+    spans = [item for item in recent_spans() if not kinds or item['kind'] in kinds]
+    st.dataframe(span_summary(spans).round(4), use_container_width=True)
+
+
+def caches_section():
+    st.write("### Caches and connections")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("Datasets")
+        stats = dataset_stats()
+        if stats:
+            datasets_df = pd.DataFrame(stats).T
+            datasets_df['loaded_at'] = datasets_df['loaded_at'].map(format_time)
+            st.dataframe(datasets_df, use_container_width=True)
+            # memory by column of a dataset already loaded in this process; deep=True walks every string
+            name = st.selectbox("Dataset memory", list(stats))
+            if st.button("Measure memory"):
+                st.dataframe(memory_report(get_dataset(name)), use_container_width=True)
+        st.write("Warm-up")
+        status = warmup_status()
+        if status:
+            warmup_df = pd.DataFrame(status).T
+            warmup_df['last_refresh'] = warmup_df['last_refresh'].map(format_time)
+            st.dataframe(warmup_df, use_container_width=True)
+    with col2:
+        st.write("Report result cache")
+        st.json(result_cache_stats())
+        st.write("Connection pool")
+        st.json(pool_stats())
+
+
+def monitor_page():
+    st.title("Monitor")
+    st.caption(f"Spans are also written to {perf_log_path}" if perf_log_path else "Spans are kept in memory only")
+    if st.sidebar.button("Clear timings"):
+        clear_spans()
+    reruns_section()
+    summary_section()
+    caches_section()
+
+
+# Display the Monitor page if this script is run
+def main():
+    # Check if the user is logged in
+    if st.session_state.get('logged_in'):
+        try:
+            permissions = get_permissions(st.session_state.get('user_code'))
+        except SQLAlchemyError as e:
+            st.error(f"Failed to retrieve user group: {str(e.__dict__['orig'])}")
+            return
+
+        # the Monitor page is for admins only
+        if is_admin(permissions):
+            monitor_page()
+        else:
+            st.warning("You do not have permission to access this page.")
+
+        # Sidebar with navigation options
+        with st.sidebar:
+            st.write(f"Welcome, {st.session_state['user_name']}!")
+            # the main menu
+            app_menu()
+    else:
+        st.warning("You must log in to access this page.")
+        st.stop()  # Stops execution if not logged in
+
+if __name__ == "__main__":
+    with rerun("Monitor", st.session_state.get("user_code")):
+        main()
@@ -2,19 +2,19 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.exc import SQLAlchemyError
 
 # local imports
 # import the page title
 from wofofiles.globfuncs import get_app_title
 # import the menu
 from wofofiles.menu import app_menu
-# import the database connection
-from wofofiles.conn import username, password, host, port, database
-# import the sales reports
-import pages.reports.R_S as R_S
-import inspect
+# import the cached user permissions
+from wofofiles.auth import get_permissions, pages_with_prefix
+# import the report registry, report modules load when a report is selected
+from pages.reports.registry import get_report, prefetch_reports, start_report_warmup
+# import the timings recorder
+from wofofiles.perf import rerun
 
 # page config
 st.set_page_config(
@@ -23,29 +23,14 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Create the SQLAlchemy engine to interact with the database
-connection_string = f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
-engine = create_engine(connection_string, echo=True)
-
+# Keep the report datasets and results warm, also when a session opens this page first
+start_report_warmup()
 
 # Function to check user access
 def user_has_access(user_code, section_name):
     try:
-        with engine.connect() as connection:
-            # Check direct user access and group-based access
-            result = connection.execute(text("""
-                SELECT DISTINCT s.SectionName
-                FROM access_control ac
-                JOIN sections s ON ac.SectionCode = s.SectionCode
-                WHERE (ac.UserCode = :user_code 
-                      OR ac.GroupCode IN (
-                          SELECT GroupCode 
-                          FROM access_control 
-                          WHERE UserCode = :user_code AND GroupCode IS NOT NULL
-                      ))
-                AND s.SectionName = :section_name
-            """), {"user_code": user_code, "section_name": section_name})
-            return result.fetchone() is not None
+        # Direct user access and group-based access come from the cached permissions
+        return section_name in get_permissions(user_code)['sections']
     except SQLAlchemyError as e:
         st.error(f"Error checking user access: {e}")
         return False
@@ -56,19 +41,7 @@ current_user_code = st.session_state.get("user_code")
 # Function to get all sections for a user
 def get_user_sections(user_code):
     try:
-        with engine.connect() as connection:
-            result = connection.execute(text("""
-                SELECT DISTINCT s.SectionName
-                FROM access_control ac
-                JOIN sections s ON ac.SectionCode = s.SectionCode
-                WHERE ac.UserCode = :user_code 
-                OR ac.GroupCode IN (
-                    SELECT GroupCode 
-                    FROM access_control 
-                    WHERE UserCode = :user_code AND GroupCode IS NOT NULL
-                )
-            """), {"user_code": user_code})
-            return [row[0] for row in result]
+        return sorted(get_permissions(user_code)['sections'])
     except SQLAlchemyError as e:
         st.error(f"Error fetching user sections: {e}")
         return []
@@ -77,62 +50,35 @@ def get_user_sections(user_code):
 def display_sales_report():
     if user_has_access(current_user_code, "Sales"):
         try:
-            with engine.connect() as connection:
-                # Get report names with page-level permission check
-                result = connection.execute(text("""
-                    SELECT DISTINCT p.Pagename 
-                    FROM pages p
-                    JOIN access_control ac ON p.PageRef = ac.PageRef
-                    WHERE p.PageRef LIKE 'R_S%'
-                    AND (ac.UserCode = :user_code 
-                        OR ac.GroupCode IN (
-                            SELECT GroupCode 
-                            FROM access_control 
-                            WHERE UserCode = :user_code AND GroupCode IS NOT NULL
-                        ))
-                """), {"user_code": current_user_code})
-                reports = [row[0] for row in result]
-                
-                # Create sidebar selection
-                with st.sidebar:
-                    st.title("Sales Department")
-                    report = st.selectbox(
-                        "**Select a report ⤵**",
-                        [""] + reports,
-                        index=0,
-                        key="report_selectbox_1"
-                    )
-
-                # Get page references with permission check
-                result = connection.execute(text("""
-                    SELECT DISTINCT p.Pagename, p.PageRef
-                    FROM pages p
-                    JOIN access_control ac ON p.PageRef = ac.PageRef
-                    WHERE p.PageRef LIKE 'R_S%'
-                    AND (ac.UserCode = :user_code 
-                        OR ac.GroupCode IN (
-                            SELECT GroupCode 
-                            FROM access_control 
-                            WHERE UserCode = :user_code AND GroupCode IS NOT NULL
-                        ))
-                """), {"user_code": current_user_code})
-                pagesidx = {row[0]: row[1] for row in result}
+            # Get report names and page references with page-level permission check
+            pagesidx = pages_with_prefix(get_permissions(current_user_code), "R_S")
         except SQLAlchemyError as e:
             st.error(f"Error fetching reports: {e}")
             return
+        reports = list(pagesidx)
+
+        # Start loading the data of every report the user can open while they choose one
+        prefetch_reports(pagesidx.values())
+
+        # Create sidebar selection
+        with st.sidebar:
+            st.title("Sales Department")
+            report = st.selectbox(
+                "**Select a report ⤵**",
+                [""] + reports,
+                index=0,
+                key="report_selectbox_1"
+            )
 
         # Get the page code for the selected report
         pagecode = pagesidx.get(report)
 
-        # Get all functions from the R_S module
-        report_functions = {}
-        for name, obj in inspect.getmembers(R_S, inspect.isfunction):
-            if name.startswith("R_S"):
-                report_functions[name] = obj
+        # Look up the registered report for the page code
+        report_entry = get_report(pagecode)
 
         # Display the report based on the page code
-        if pagecode and pagecode in report_functions:
-            report_functions[pagecode]()
+        if report_entry:
+            report_entry['func']()
         else:
             st.warning("Please select a report from sidebar")
 
@@ -163,7 +109,9 @@ def main():
         st.stop()  # Stops execution if not logged in
 
 if __name__ == "__main__":
-    main()
+    # every span of this rerun (loads, queries, aggregations, the report) is shown on the Monitor page
+    with rerun("Reports", current_user_code):
+        main()
 
 
 
@@ -1,35 +1,111 @@
+import copy
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import time
 
 # local imports
-from wofofiles.df_src import returns_report
+from wofofiles.df_src import get_dataset, slice_transactions, refresh_datasets, refresh_status, frame_version
+from wofofiles.result_cache import cached_result, most_used_params
+from wofofiles.perf import timed
 from wofofiles.globfuncs import format_value
+from pages.reports.registry import report
+from pages.reports.charts import pie_chart_spec, pie_chart_png
+from pages.reports.aggregations import return_rate_breakdowns, create_result_df, daily_return_rate, item_return_rate
+
+
+# Datasets reloaded together by the "Fetch New Data" button
+report_datasets = ('daily_cube', 'returns_report')
+
+
+# Cache version of the report: the versions of both frames it is computed from
+def report_version(cube, data):
+    return [frame_version(cube), frame_version(data)]
+
+
+# Everything the returns report shows for one store and date range
+# computed once per (store, dates, data versions) and shared by every session; do not modify the result
+@timed('aggregation', 'R_S00001')
+def returns_report_results(cube, data, store, start, end):
+    # Totals and per-dimension tables are answered from the daily rollup cube, not the invoice lines
+    filtered_cube = slice_transactions(cube, store, start, end)
+    # Item quantities need the invoice lines: a binary-search slice on the (StoreName, TransactionDate) index
+    filtered_data = slice_transactions(data, store, start, end)
+
+    total_sales = filtered_cube['SalesValue'].sum()
+    total_returns = filtered_cube['ReturnValue'].sum()
+    breakdowns = return_rate_breakdowns(filtered_cube, ['CustomerName', 'UserName', 'GroupName', 'TransactionDate'])
+    customer_sales_value, customer_return_value, customer_return_rate = breakdowns['CustomerName']
+    day_sales_value, day_return_value, day_return_rate = breakdowns['TransactionDate']
+
+    return {
+        'total_sales': total_sales,
+        'total_returns': total_returns,
+        'return_rate': "{:.1f}".format((total_returns / total_sales) * 100),
+        'customer': create_result_df(customer_sales_value, customer_return_value, customer_return_rate),
+        'customer_returns': customer_return_value[customer_return_value > 0],
+        'user': create_result_df(*breakdowns['UserName']),
+        'group': create_result_df(*breakdowns['GroupName']),
+        'item': item_return_rate(filtered_data),
+        'day': create_result_df(day_sales_value, day_return_value, day_return_rate),
+        'day_trend': daily_return_rate(day_sales_value, day_return_value),
+    }
+
+
+# Recompute the most used store/date selections (or the default view) on the current data, for the warm-up scheduler
+def warm_returns_report(limit=5):
+    cube = get_dataset('daily_cube')
+    data = get_dataset('returns_report')
+    params_list = most_used_params("R_S00001", limit) or [{
+        'store': cube['StoreName'].unique()[0],
+        'start': pd.Timestamp(cube['TransactionDate'].min()),
+        'end': pd.Timestamp(cube['TransactionDate'].max())
+    }]
+    for params in params_list:
+        cached_result(
+            "R_S00001", params, report_version(cube, data),
+            lambda: returns_report_results(cube, data, params['store'], params['start'], params['end']),
+            track_usage=False
+        )
+
+
+# Sidebar progress of the background refresh, polled every second; the report reruns on the new data when it is done
+# only rendered while this session waits for a refresh, so idle sessions do not poll
+@st.fragment(run_every=1)
+def refresh_progress():
+    statuses = [status for status in map(refresh_status, report_datasets) if status]
+    running = [status for status in statuses if status['running']]
+    if running:
+        elapsed = max(status['elapsed_seconds'] for status in running)
+        expected = max(status['expected_seconds'] or 0 for status in running)
+        progress = min(elapsed / expected, 0.99) if expected else 0.0
+        st.progress(progress, text=f"Fetching new data... {elapsed:.0f}s")
+        return
+    st.session_state['R_S00001_refreshing'] = False
+    st.session_state['R_S00001_refresh_errors'] = [status['error'] for status in statuses if status['error']]
+    st.rerun()
 
 
 # Returns Report
+# the declared datasets are prefetched when the Reports page opens, so they are ready when this runs
+@report("R_S00001", datasets=("returns_report", "daily_cube"), warm=warm_returns_report)
 def R_S00001():
 
-    df_1 = returns_report()
-    
-    # Mock function to simulate data retrieval
-    def fetch_data():
-        time.sleep(2)  # Simulate a delay
-        return df_1
-
-    # Caching function with TTL (time-to-live)
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def get_data():
-        return fetch_data()
+    # during a refresh these are still the previous frames, so the report keeps answering from them
+    cube = get_dataset('daily_cube')
+    data = get_dataset('returns_report')
 
+    # Reload both datasets in one background job; a refresh already running is joined, not repeated
     if st.sidebar.button("Fetch New Data"):
-        with st.spinner("Fetching new data..."):
-            data = fetch_data()  # Fetch directly without cache
-        st.success("New data fetched!")
-    else:
-        with st.spinner("Retrieving cached data..."):
-            data = get_data()  # Retrieve cached data
+        refresh_datasets(report_datasets)
+        st.session_state['R_S00001_refreshing'] = True
+    if st.session_state.get('R_S00001_refreshing'):
+        with st.sidebar:
+            refresh_progress()
+    errors = st.session_state.pop('R_S00001_refresh_errors', None)
+    if errors is not None:
+        if errors:
+            st.sidebar.error(f"Fetching new data failed: {errors[0]}")
+        else:
+            st.sidebar.success("New data fetched!")
 
     # Filters
 
@@ -41,141 +117,85 @@ def R_S00001():
         st.title("Returns Report")
 
     with col2:
-        selected_store = st.selectbox("Store Name", df_1['StoreName'].unique())
+        selected_store = st.selectbox("Store Name", cube['StoreName'].unique())
 
     with col3:    
         date_range = st.date_input(
             "Date Range",
-            value=(pd.Timestamp(df_1['TransactionDate'].min()).to_pydatetime(), pd.Timestamp(df_1['TransactionDate'].max()).to_pydatetime()),
-            min_value=pd.Timestamp(df_1['TransactionDate'].min()).to_pydatetime(),
-            max_value=pd.Timestamp(df_1['TransactionDate'].max()).to_pydatetime()
+            value=(pd.Timestamp(cube['TransactionDate'].min()).to_pydatetime(), pd.Timestamp(cube['TransactionDate'].max()).to_pydatetime()),
+            min_value=pd.Timestamp(cube['TransactionDate'].min()).to_pydatetime(),
+            max_value=pd.Timestamp(cube['TransactionDate'].max()).to_pydatetime()
         )
 
-    # Ensure 'TransactionDate' is in datetime format
-    # Ensure 'TransactionDate' is in datetime format if it exists
-    if 'TransactionDate' in data.columns:
-        try:
-            data['TransactionDate'] = pd.to_datetime(data['TransactionDate'], format="%d-%m-%Y", dayfirst=True)
-        except Exception as e:
-            st.error(f"Error converting 'TransactionDate' to datetime: {e}")
-            return
     # Convert date_range to datetime64[ns] for comparison
     date_range = pd.to_datetime(date_range)
 
-    # Apply filters to the data
-    filtered_data = data[(data['StoreName'] == selected_store) & 
-                         (data['TransactionDate'] >= date_range[0]) & 
-                         (data['TransactionDate'] <= date_range[1])]
-
-    # Calculate the total sales and returns
-    Total_Sales = (filtered_data['SalesPrice'] - filtered_data['DiscountValue']) * filtered_data['SalesQuantity']
-    Total_Sales_Sum = Total_Sales.sum()
-    Total_Return = (filtered_data['SalesPrice'] - filtered_data['DiscountValue']) * filtered_data['ReturnQuantity']
-    Total_Return_Sum = Total_Return.sum()
-    Return_Rate = (Total_Return_Sum / Total_Sales_Sum) * 100
-    Return_Rate = "{:.1f}".format(Return_Rate)
-
-    st.write(f"Total Sales Sum: {format_value(Total_Sales_Sum)}")
-    st.write(f"Total Return Sum: {format_value(Total_Return_Sum)}")
-    st.write(f"Return Rate: {Return_Rate}%")
-
-    # Function to calculate return rate
-    def calculate_return_rate(group_by_column):
-        group_by = filtered_data.groupby(group_by_column)
-        sales_value = group_by.apply(lambda x: ((x['SalesPrice'] - x['DiscountValue']) * x['SalesQuantity']).sum())
-        return_value = group_by.apply(lambda x: ((x['SalesPrice'] - x['DiscountValue']) * x['ReturnQuantity']).sum())
-        return_rate = (return_value / sales_value) * 100
-        return_rate = return_rate.fillna(0).round(1).astype(str) + '%'
-        return sales_value, return_value, return_rate
-
-    # Function to create result DataFrame
-    def create_result_df(sales_value, return_value, return_rate):
-        result_df = pd.DataFrame({
-            'Total Sales': sales_value.apply(format_value),
-            'Total Returns': return_value.apply(format_value),
-            'Return Rate': return_rate
-        })
-        total_sales_sum = sales_value.sum()
-        total_returns_sum = return_value.sum()
-        total_return_rate = (total_returns_sum / total_sales_sum) * 100
-        total_return_rate = "{:.1f}%".format(total_return_rate)
-        total_row = pd.DataFrame({
-            'Total Sales': [format_value(total_sales_sum)],
-            'Total Returns': [format_value(total_returns_sum)],
-            'Return Rate': [total_return_rate]
-        }, index=['Total'])
-        result_df = pd.concat([result_df, total_row])
-        return result_df
+    # the key follows the versions of the frames being served, which a refresh publishes together
+    params = {'store': selected_store, 'start': date_range[0], 'end': date_range[-1]}
+    version = report_version(cube, data)
+    with st.spinner("Retrieving cached data..."):
+        results = cached_result(
+            "R_S00001", params, version,
+            lambda: returns_report_results(cube, data, selected_store, date_range[0], date_range[-1])
+        )
+
+    st.write(f"Total Sales Sum: {format_value(results['total_sales'])}")
+    st.write(f"Total Return Sum: {format_value(results['total_returns'])}")
+    st.write(f"Return Rate: {results['return_rate']}%")
 
     st.write("### Who Returns More?")
 
     with st.expander("**Customer-wise Analysis**", expanded=False):
-        # Calculate and display return rate per customer
-        customer_sales_value, customer_return_value, customer_return_rate = calculate_return_rate('CustomerName')
-        customer_result_df = create_result_df(customer_sales_value, customer_return_value, customer_return_rate)
-        
+        # return rate per customer
         col1, col2 = st.columns([0.6, 0.4])
 
         with col1:
-            st.dataframe(customer_result_df)
+            st.dataframe(results['customer'])
 
         with col2:
-            # generate a pie chart by matplotlib for customer return rate "contribution of each customer to the total return rate"
-            # filter zero return rate
-            customer_return_value = customer_return_value[customer_return_value > 0]
-            fig, ax = plt.subplots()
-            ax.pie(customer_return_value, labels=customer_return_value.index, autopct='%1.1f%%')
-            ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-            st.pyplot(fig)
+            # pie chart of the contribution of each customer to the total returns
+            # built only when asked for, once per (filters, data versions), and shared like the tables
+            chart_style = st.radio("Chart", ["Hidden", "Interactive", "Image"], horizontal=True, key='R_S00001_pie')
+            # customers without returns are already filtered out
+            customer_return_value = results['customer_returns']
+            if chart_style == "Interactive":
+                spec = cached_result(
+                    "R_S00001:pie", params, version,
+                    lambda: pie_chart_spec(customer_return_value, 'CustomerName', 'ReturnValue')
+                )
+                # the cached spec is shared between sessions, streamlit gets its own copy
+                st.vega_lite_chart(copy.deepcopy(spec), use_container_width=True)
+            elif chart_style == "Image":
+                png = cached_result("R_S00001:pie_png", params, version, lambda: pie_chart_png(customer_return_value))
+                st.image(png)
 
     with st.expander("**User-wise Analysis**", expanded=False):
-        # Calculate and display return rate per user
-        user_sales_value, user_return_value, user_return_rate = calculate_return_rate('UserName')
-        user_result_df = create_result_df(user_sales_value, user_return_value, user_return_rate)
-        st.dataframe(user_result_df)
+        # return rate per user
+        st.dataframe(results['user'])
 
     with st.expander("**Item-wise Analysis**", expanded=False):
-        # Calculate and display return rate per item name
-        group_by_item = filtered_data.groupby('ItemNameEn')
-        item_sales_qty = group_by_item['SalesQuantity'].sum()
-        item_return_qty = group_by_item['ReturnQuantity'].sum()
-        non_zero_return_mask = item_return_qty > 0
-        item_sales_qty = item_sales_qty[non_zero_return_mask]
-        item_return_qty = item_return_qty[non_zero_return_mask]
-        item_return_rate = (item_return_qty / item_sales_qty) * 100
-        item_return_rate = item_return_rate.fillna(0).round(1).astype(str) + '%'
-        item_result_df = pd.DataFrame({
-            'Total Sales Quantity': item_sales_qty,
-            'Total Return Quantity': item_return_qty,
-            'Return Rate': item_return_rate
-        })
-        total_item_sales_qty = item_sales_qty.sum()
-        total_item_return_qty = item_return_qty.sum()
-        total_item_return_rate = (total_item_return_qty / total_item_sales_qty) * 100
-        total_item_return_rate = "{:.1f}%".format(total_item_return_rate)
-        total_item_row = pd.DataFrame({
-            'Total Sales Quantity': [total_item_sales_qty],
-            'Total Return Quantity': [total_item_return_qty],
-            'Return Rate': [total_item_return_rate]
-        }, index=['Total'])
-        item_result_df = pd.concat([item_result_df, total_item_row])
-
         col1, col2 = st.columns(2)
 
         with col1:
             st.write("### Return Rate / Item Name")
-            st.dataframe(item_result_df)
+            st.dataframe(results['item'])
 
         with col2:
             st.write("### Return Rate / Group Name")
-            # Calculate and display return rate per group name
-            group_sales_value, group_return_value, group_return_rate = calculate_return_rate('GroupName')
-            group_result_df = create_result_df(group_sales_value, group_return_value, group_return_rate)
-            st.dataframe(group_result_df)
+            st.dataframe(results['group'])
 
     with st.expander("**Days-wise Analysis**", expanded=False):
         st.write("Return Rate / Day")
 
+        col1, col2 = st.columns([0.4, 0.6])
+
+        with col1:
+            st.dataframe(results['day'])
+
+        with col2:
+            st.line_chart(results['day_trend'])
+
+@report("R_S00002")
 def R_S00002():
     st.write("## Report 2 Overview")
     st.write("This is the Report 2 overview.")
@@ -0,0 +1,78 @@
+import pandas as pd
+
+# local imports
+from wofofiles.globfuncs import format_value
+from wofofiles.df_src import add_value_columns
+
+
+# Format a return rate series as '12.3%'
+def format_return_rate(return_value, sales_value):
+    return_rate = (return_value / sales_value) * 100
+    return return_rate.fillna(0).round(1).astype(str) + '%'
+
+
+# Sales value, return value and return rate per group of one column
+def calculate_return_rate(data, group_by_column):
+    if 'SalesValue' not in data.columns:
+        data = add_value_columns(data)
+    totals = data.groupby(group_by_column, observed=True)[['SalesValue', 'ReturnValue']].sum()
+    sales_value = totals['SalesValue']
+    return_value = totals['ReturnValue']
+    return sales_value, return_value, format_return_rate(return_value, sales_value)
+
+
+# Return rate breakdowns for several columns, sharing one pass over the value columns
+def return_rate_breakdowns(data, group_by_columns):
+    if 'SalesValue' not in data.columns:
+        data = add_value_columns(data)
+    return {column: calculate_return_rate(data, column) for column in group_by_columns}
+
+
+# Numeric return rate per day for the trend chart
+def daily_return_rate(sales_value, return_value):
+    return (return_value / sales_value * 100).fillna(0).round(1).rename('Return Rate %')
+
+
+# Report table with a 'Total' row, as shown in the returns report
+def create_result_df(sales_value, return_value, return_rate):
+    result_df = pd.DataFrame({
+        'Total Sales': format_value(sales_value),
+        'Total Returns': format_value(return_value),
+        'Return Rate': return_rate
+    })
+    total_sales_sum = sales_value.sum()
+    total_returns_sum = return_value.sum()
+    total_return_rate = (total_returns_sum / total_sales_sum) * 100
+    total_return_rate = "{:.1f}%".format(total_return_rate)
+    total_row = pd.DataFrame({
+        'Total Sales': [format_value(total_sales_sum)],
+        'Total Returns': [format_value(total_returns_sum)],
+        'Return Rate': [total_return_rate]
+    }, index=['Total'])
+    result_df = pd.concat([result_df, total_row])
+    return result_df
+
+
+# Sales and return quantity per item with a 'Total' row; items without returns are left out
+def item_return_rate(data):
+    group_by_item = data.groupby('ItemNameEn', observed=True)
+    item_sales_qty = group_by_item['SalesQuantity'].sum()
+    item_return_qty = group_by_item['ReturnQuantity'].sum()
+    non_zero_return_mask = item_return_qty > 0
+    item_sales_qty = item_sales_qty[non_zero_return_mask]
+    item_return_qty = item_return_qty[non_zero_return_mask]
+    item_result_df = pd.DataFrame({
+        'Total Sales Quantity': item_sales_qty,
+        'Total Return Quantity': item_return_qty,
+        'Return Rate': format_return_rate(item_return_qty, item_sales_qty)
+    })
+    total_item_sales_qty = item_sales_qty.sum()
+    total_item_return_qty = item_return_qty.sum()
+    total_item_return_rate = (total_item_return_qty / total_item_sales_qty) * 100
+    total_item_return_rate = "{:.1f}%".format(total_item_return_rate)
+    total_item_row = pd.DataFrame({
+        'Total Sales Quantity': [total_item_sales_qty],
+        'Total Return Quantity': [total_item_return_qty],
+        'Return Rate': [total_item_return_rate]
+    }, index=['Total'])
+    return pd.concat([item_result_df, total_item_row])
@@ -0,0 +1,45 @@
+import io
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# local imports
+from wofofiles.perf import timed
+
+
+# Vega-Lite spec of a pie chart of one value series, rendered by the browser with st.vega_lite_chart
+@timed('render')
+def pie_chart_spec(values, label, value_name):
+    data = [{label: str(name), value_name: float(value)} for name, value in values.items()]
+    return {
+        'data': {'values': data},
+        'transform': [
+            {'joinaggregate': [{'op': 'sum', 'field': value_name, 'as': 'Total'}]},
+            {'calculate': f"datum['{value_name}'] / datum.Total", 'as': 'Share'}
+        ],
+        'mark': {'type': 'arc', 'tooltip': True},
+        'encoding': {
+            'theta': {'field': value_name, 'type': 'quantitative', 'stack': True},
+            'color': {'field': label, 'type': 'nominal'},
+            'tooltip': [
+                {'field': label, 'type': 'nominal'},
+                {'field': value_name, 'type': 'quantitative', 'format': ',.1f'},
+                {'field': 'Share', 'type': 'quantitative', 'format': '.1%'}
+            ]
+        },
+        'view': {'stroke': None}
+    }
+
+
+# PNG bytes of a matplotlib pie chart; the figure is closed before returning so reruns do not accumulate figures
+@timed('render')
+def pie_chart_png(values):
+    fig, ax = plt.subplots()
+    try:
+        ax.pie(values, labels=values.index, autopct='%1.1f%%')
+        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
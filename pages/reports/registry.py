@@ -0,0 +1,88 @@
+import importlib
+import threading
+
+# local imports
+from wofofiles.df_src import prefetch_datasets, submit_prefetch
+from wofofiles.warmup import register_warmer, start_scheduler
+from wofofiles.perf import timed
+
+
+# Report modules per department prefix; a module is imported the first time one of its reports is used
+# (add R_F, R_H, ... here when those departments get reports)
+departments = {
+    'R_S': 'pages.reports.R_S',
+}
+
+# report code -> {'func', 'datasets', 'department'}
+_reports = {}
+_loaded = set()
+_lock = threading.Lock()
+# the pending prefetch_reports task, so reruns don't queue another while it runs
+_prefetch_task = None
+
+
+# Register a report function under its page code (e.g. R_S00001) with the df_src datasets it reads
+# warm is an optional function the warm-up scheduler calls to recompute the report's most used results
+def report(code, datasets=(), warm=None):
+    def decorator(func):
+        # each run of the report, rendering included, is timed for the Monitor page
+        _reports[code] = {'func': timed('report', code)(func), 'datasets': tuple(datasets), 'department': code[:3]}
+        if warm is not None:
+            register_warmer(code)(warm)
+        return func
+    return decorator
+
+
+# Import a department's report module once
+def load_department(prefix):
+    if prefix in _loaded:
+        return
+    with _lock:
+        if prefix not in _loaded and prefix in departments:
+            importlib.import_module(departments[prefix])
+            _loaded.add(prefix)
+
+
+# The registered report for a page code, loading its department module on first use
+def get_report(code):
+    if not code:
+        return None
+    load_department(code[:3])
+    return _reports.get(code)
+
+
+# Datasets a report declared, empty for unknown codes
+def report_datasets(code):
+    entry = get_report(code)
+    return entry['datasets'] if entry else ()
+
+
+# Import every department module, which registers the report warmers
+def load_departments():
+    for prefix in departments:
+        load_department(prefix)
+
+
+# Start the warm-up scheduler once per process; the report modules are imported on its thread, not the page's
+# (called by app.py and by the pages that use reports, as a session may open any page first)
+def start_report_warmup():
+    return start_scheduler(setup=load_departments)
+
+
+# Load the datasets of the given reports in the background, before the user picks one
+def prefetch_reports(codes):
+    global _prefetch_task
+    codes = [code for code in codes if code]
+
+    def start():
+        names = []
+        for code in codes:
+            for name in report_datasets(code):
+                if name not in names:
+                    names.append(name)
+        prefetch_datasets(names)
+
+    # importing the department modules happens off the script thread too, on the shared prefetch pool
+    with _lock:
+        if _prefetch_task is None or _prefetch_task.done():
+            _prefetch_task = submit_prefetch(start)
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from wofofiles.batch import apply_batches, changed_labels, deleted_rows, format_summary, inserted_rows, key_params, update_params
+
+
+@pytest.fixture
+def original():
+    return pd.DataFrame({'Code': [1, 2, 3, 4], 'Name': ['a', 'b', 'c', 'd'], 'Delete': False})
+
+
+# What data_editor returns with num_rows="dynamic": kept labels, removed rows dropped, new rows appended
+@pytest.fixture
+def edited(original):
+    edited = original.copy()
+    edited.loc[1, 'Name'] = 'B'       # changed
+    edited.loc[2, 'Delete'] = True    # ticked
+    edited = edited.drop(index=3)     # removed in the editor
+    edited.loc[4] = [5, 'e', None]    # added
+    edited.loc[5] = [None, None, None]  # added and left blank
+    edited.loc[6] = [7, 'g', True]    # added and ticked
+    return edited
+
+
+def test_deleted_rows_are_ticked_or_removed_originals(original, edited):
+    assert deleted_rows(original, edited)['Code'].tolist() == [3, 4]
+
+
+def test_changed_labels_skip_deleted_and_added_rows(original, edited):
+    edited.loc[2, 'Name'] = 'C'
+    assert changed_labels(original, edited, ['Code', 'Name']) == [1]
+
+
+def test_inserted_rows_skip_blank_and_ticked_rows(original, edited):
+    assert inserted_rows(original, edited, ['Code', 'Name'])['Code'].tolist() == [5]
+
+
+def test_update_params_take_keys_from_the_original_grid(original, edited):
+    edited.loc[1, 'Code'] = 20
+    params = update_params(original, edited, [1], {'new_code': 'Code', 'new_name': 'Name'}, {'old_code': 'Code'})
+    assert params == [{'new_code': 20, 'new_name': 'B', 'old_code': 2}]
+
+
+def test_apply_batches_writes_all_or_nothing(original, edited):
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (Code INTEGER PRIMARY KEY, Name TEXT)"))
+        connection.execute(text("INSERT INTO t VALUES (:Code, :Name)"), key_params(original, {'Code': 'Code', 'Name': 'Name'}))
+
+    def batches(inserted):
+        return [
+            ("deleted", text("DELETE FROM t WHERE Code = :code"), key_params(deleted_rows(original, edited), {'code': 'Code'})),
+            ("updated", text("UPDATE t SET Name = :name WHERE Code = :code"),
+             update_params(original, edited, changed_labels(original, edited, ['Code', 'Name']), {'name': 'Name'}, {'code': 'Code'})),
+            ("inserted", text("INSERT INTO t (Code, Name) VALUES (:code, :name)"), inserted)
+        ]
+
+    def table():
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT Code, Name FROM t ORDER BY Code")).fetchall()
+
+    # a duplicate key in the last batch rolls back the delete and update before it
+    with pytest.raises(Exception):
+        apply_batches(engine, batches([{'code': 1, 'name': 'dup'}]))
+    assert table() == [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')]
+
+    added = key_params(inserted_rows(original, edited, ['Code', 'Name']), {'code': 'Code', 'name': 'Name'})
+    summary = apply_batches(engine, batches(added))
+    assert format_summary(summary) == "2 deleted, 1 updated, 1 inserted"
+    assert table() == [(1, 'a'), (2, 'B'), (5, 'e')]
@@ -0,0 +1,118 @@
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from wofofiles import chat_plan
+from wofofiles.chat_plan import PlanError, plan_and_run, plan_columns, request_plan, run_plan, validate_plan
+
+
+# Stands in for openai.OpenAI: returns the given replies in order and records every request
+class StubClient:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        reply = self.replies.pop(0)
+        content = reply if isinstance(reply, str) else json.dumps(reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'StoreName': pd.Categorical(['North', 'North', 'South', 'South']),
+        'TransactionDate': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-01', '2024-01-03']),
+        'SalesPrice': [10.0, 20.0, 5.0, 8.0],
+        'DiscountValue': [0.0, 2.0, 0.0, 0.0],
+        'SalesQuantity': [3, 1, 4, 2],
+        'ReturnQuantity': [1, 0, 0, 1],
+    })
+
+
+@pytest.fixture(autouse=True)
+def empty_plan_cache():
+    chat_plan._results.clear()
+    yield
+    chat_plan._results.clear()
+
+
+def test_request_plan_sends_schema_and_parses_json(df):
+    client = StubClient({'group_by': ['StoreName']})
+    plan = request_plan(client, "sales per store", plan_columns(df))
+    assert plan == {'group_by': ['StoreName']}
+    request = client.requests[0]
+    assert request['response_format'] == {'type': 'json_object'}
+    assert 'SalesValue' in request['messages'][0]['content']
+    assert request['messages'][1]['content'] == "sales per store"
+
+
+def test_request_plan_rejects_invalid_json(df):
+    with pytest.raises(PlanError):
+        request_plan(StubClient("not json"), "anything", plan_columns(df))
+
+
+@pytest.mark.parametrize('plan', [
+    [],
+    {'filters': None},
+    {'filters': [{'column': 'StoreName', 'op': 'like', 'value': 'N'}]},
+    {'filters': [{'column': 'Missing', 'op': '==', 'value': 1}]},
+    {'filters': ['StoreName']},
+    {'filters': [{'column': 'TransactionDate', 'op': 'between', 'value': '2024-01-01'}]},
+    {'group_by': 'StoreName'},
+    {'group_by': ['Missing']},
+    {'metrics': ['SalesValue']},
+    {'metrics': [{'column': 'SalesValue', 'agg': 'median'}]},
+    {'sort': 'SalesValue'},
+    {'limit': '10'},
+    {'limit': 0},
+    {'limit': True},
+])
+def test_validate_plan_rejects_malformed_plans(df, plan):
+    with pytest.raises(PlanError):
+        validate_plan(plan, plan_columns(df))
+
+
+def test_run_plan_filters_groups_and_sorts(df):
+    plan = {
+        'filters': [{'column': 'TransactionDate', 'op': 'between', 'value': ['2024-01-01', '2024-01-02']}],
+        'group_by': ['StoreName'],
+        'metrics': [{'column': 'SalesValue', 'agg': 'sum', 'as': 'Sales'}],
+        'sort': {'by': 'Sales', 'ascending': False},
+        'limit': 1,
+    }
+    result = run_plan(df, plan)
+    assert list(result.columns) == ['StoreName', 'Sales']
+    assert result['StoreName'].tolist() == ['North']
+    assert result['Sales'].tolist() == [48.0]
+
+
+def test_run_plan_rejects_unknown_columns(df):
+    with pytest.raises(PlanError):
+        run_plan(df, {'group_by': ['Missing']})
+
+
+def test_plan_and_run_caches_per_dataset_version(df):
+    reply = {'metrics': [{'column': 'ReturnQuantity', 'agg': 'sum', 'as': 'Returns'}]}
+    client = StubClient(reply, reply)
+
+    plan, result = plan_and_run(client, df, 'v1', "Total returns?")
+    assert result['Returns'].tolist() == [2]
+    # the same question with other case and spacing is answered from the cache
+    assert plan_and_run(client, df, 'v1', "  total   RETURNS? ")[0] == plan
+    assert len(client.requests) == 1
+    # a new dataset version asks again
+    plan_and_run(client, df, 'v2', "Total returns?")
+    assert len(client.requests) == 2
+
+
+def test_plan_and_run_does_not_cache_rejected_plans(df):
+    client = StubClient({'group_by': 'StoreName'}, {'group_by': ['StoreName']})
+    with pytest.raises(PlanError):
+        plan_and_run(client, df, 'v1', "stores")
+    plan, result = plan_and_run(client, df, 'v1', "stores")
+    assert sorted(result['StoreName'].astype(str)) == ['North', 'South']
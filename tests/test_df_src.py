@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+from wofofiles.df_src import build_daily_cube, index_by_store_date, missing_store, slice_transactions
+
+
+@pytest.fixture
+def lines():
+    return pd.DataFrame({
+        'StoreName': pd.Categorical(['A', 'z', None, 'z', 'A', None]),
+        'GroupName': pd.Categorical(['g'] * 6),
+        'UserName': pd.Categorical(['u'] * 6),
+        'CustomerName': pd.Categorical(['c'] * 6),
+        'TransactionDate': pd.to_datetime(['2024-01-02', '2024-01-01', '2024-01-01', '2024-01-03', '2024-01-01', '2024-01-02']),
+        'SalesPrice': [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        'DiscountValue': 0.0,
+        'SalesQuantity': 1,
+        'ReturnQuantity': 0,
+    })
+
+
+# a store sorting after the missing-store rows used to leave the index unsorted
+@pytest.mark.parametrize('store, expected', [('A', [50.0, 10.0]), ('z', [20.0]), (missing_store, [30.0, 60.0]), ('q', [])])
+def test_slice_transactions_with_missing_stores(lines, store, expected):
+    df = index_by_store_date(lines)
+    assert slice_transactions(df, store, '2024-01-01', '2024-01-02')['SalesPrice'].tolist() == expected
+
+
+def test_daily_cube_slices_keep_lines_without_a_store(lines):
+    cube = index_by_store_date(build_daily_cube(lines))
+    assert cube['SalesValue'].sum() == lines['SalesPrice'].sum()
+    assert slice_transactions(cube, missing_store, '2024-01-01', '2024-01-03')['SalesValue'].sum() == 90.0
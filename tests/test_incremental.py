@@ -0,0 +1,66 @@
+import os
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+from wofofiles import incremental, snapshot
+
+
+# Stands in for the MySQL table: information_schema rows and the rows SELECT returns
+class FakeTable:
+    def __init__(self):
+        self.columns = [
+            SimpleNamespace(COLUMN_NAME='Id', COLUMN_KEY='PRI', EXTRA='auto_increment', DATA_TYPE='int'),
+            SimpleNamespace(COLUMN_NAME='Shares', COLUMN_KEY='', EXTRA='', DATA_TYPE='int'),
+            SimpleNamespace(COLUMN_NAME='Owner', COLUMN_KEY='', EXTRA='', DATA_TYPE='varchar'),
+        ]
+        self.rows = pd.DataFrame({'Id': [], 'Shares': [], 'Owner': []})
+        self.queries = []
+
+    def read_chunks(self, connection, query, schema, params=None):
+        self.queries.append((query, params))
+        rows = self.rows
+        if params:
+            rows = rows[rows['Id'] > params['watermark']]
+        for start in range(0, len(rows), 2):
+            yield incremental.conform_chunk(rows.iloc[start:start + 2].copy(), schema)
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    fake = FakeTable()
+    monkeypatch.setattr(snapshot, 'snapshot_dir', str(tmp_path))
+    monkeypatch.setattr(incremental, 'refresh_interval_seconds', 0)
+    monkeypatch.setattr(incremental, 'get_engine', lambda: SimpleNamespace(connect=lambda: nullcontext()))
+    monkeypatch.setattr(incremental, 'table_columns', lambda connection, name: fake.columns)
+    monkeypatch.setattr(incremental, 'read_chunks', fake.read_chunks)
+    return fake
+
+
+def test_empty_first_load_is_followed_by_a_full_load(table):
+    assert incremental.load_incremental('owners', 'owners').empty
+    table.rows = pd.DataFrame({'Id': [1, 2], 'Shares': [10, None], 'Owner': ['a', 'b']})
+    assert incremental.load_incremental('owners', 'owners')['Id'].tolist() == [1, 2]
+    assert table.queries[-1][1] is None
+
+
+def test_delta_replaces_changed_keys_and_keeps_the_schema_types(table):
+    table.rows = pd.DataFrame({'Id': [1, 2, 3], 'Shares': [10, None, 30], 'Owner': ['a', 'b', 'c']})
+    incremental.load_incremental('owners', 'owners')
+
+    table.rows = pd.DataFrame({'Id': [1, 2, 3, 4, 5], 'Shares': [10, None, 30, 40, None], 'Owner': ['a', 'b', 'c', 'd', 'e']})
+    incremental.load_incremental('owners', 'owners')
+    assert snapshot.read_manifest('owners')['watermark'] == 5
+
+    # an auto-increment watermark only sees new ids; pretend row 2 changed and comes back with row 6
+    snapshot.update_manifest('owners', watermark=1)
+    table.rows = pd.DataFrame({'Id': [2, 6], 'Shares': [20, None], 'Owner': ['B', 'f']})
+    df = incremental.load_incremental('owners', 'owners')
+
+    assert df.sort_values('Id')[['Id', 'Owner']].values.tolist() == [[1, 'a'], [2, 'B'], [3, 'c'], [4, 'd'], [5, 'e'], [6, 'f']]
+    assert str(feather.read_table(snapshot.snapshot_path('owners')).schema.field('Shares').type) == 'int64'
+    assert snapshot.read_manifest('owners')['watermark'] == 6
+    assert not [path for path in os.listdir(snapshot.snapshot_dir) if path.endswith('.tmp')]
@@ -0,0 +1,84 @@
+# Python libraries
+import time
+import threading
+from sqlalchemy import text
+
+# Local imports
+from wofofiles.db import get_engine
+
+
+# How long a user's permissions are trusted before they are read again
+permissions_ttl_seconds = 300
+
+# user_code -> (loaded_at, permissions)
+_permissions = {}
+_lock = threading.Lock()
+
+
+# Everything a user can reach, through direct grants or through their groups, in one query
+def load_permissions(user_code):
+    query = text("""
+        SELECT ac.UserCode, ac.GroupCode, g.GroupName, s.SectionName, p.PageName, p.PageRef
+        FROM access_control ac
+        LEFT JOIN `groups` g ON ac.GroupCode = g.GroupCode
+        LEFT JOIN sections s ON ac.SectionCode = s.SectionCode
+        LEFT JOIN pages p ON ac.PageRef = p.PageRef
+        WHERE ac.UserCode = :user_code
+        OR ac.GroupCode IN (
+            SELECT GroupCode
+            FROM access_control
+            WHERE UserCode = :user_code AND GroupCode IS NOT NULL
+        )
+    """)
+    with get_engine().connect() as connection:
+        rows = connection.execute(query, {'user_code': user_code}).fetchall()
+
+    groups = []
+    sections = set()
+    pages = {}
+    for row in rows:
+        if row.UserCode == user_code and row.GroupName and row.GroupName not in groups:
+            groups.append(row.GroupName)
+        if row.SectionName:
+            sections.add(row.SectionName)
+        if row.PageRef:
+            pages[row.PageName] = row.PageRef
+
+    return {'user_code': user_code, 'groups': groups, 'sections': sections, 'pages': pages}
+
+
+# Cached permissions for a user, reloaded after the TTL or an invalidation
+def get_permissions(user_code):
+    now = time.time()
+    with _lock:
+        cached = _permissions.get(user_code)
+    if cached and now - cached[0] < permissions_ttl_seconds:
+        return cached[1]
+
+    permissions = load_permissions(user_code)
+    with _lock:
+        _permissions[user_code] = (now, permissions)
+    return permissions
+
+
+# Drop cached permissions after access control changes (all users when user_code is None)
+def invalidate_permissions(user_code=None):
+    with _lock:
+        if user_code is None:
+            _permissions.clear()
+        else:
+            _permissions.pop(user_code, None)
+
+
+# First group of the user, kept in session state as 'user_group'
+def primary_group(permissions):
+    return permissions['groups'][0] if permissions['groups'] else None
+
+
+def is_admin(permissions):
+    return 'Admin' in permissions['groups']
+
+
+# Pages the user can open whose reference starts with prefix, as {PageName: PageRef}
+def pages_with_prefix(permissions, prefix):
+    return {name: ref for name, ref in permissions['pages'].items() if ref.startswith(prefix)}
@@ -0,0 +1,66 @@
+# Python libraries
+import pandas as pd
+
+
+# Grids are compared by index label: data_editor keeps the labels of the original rows,
+# appends new rows after them and drops the rows removed with num_rows="dynamic"
+
+# Original rows the user wants gone: ticked in the checkbox column or removed from the editor
+def deleted_rows(original, edited, column='Delete'):
+    removed = original.index.difference(edited.index)
+    flagged = edited.index[edited[column] == True].intersection(original.index)
+    return original.loc[original.index.isin(removed.union(flagged))]
+
+
+# Labels of kept original rows whose compare columns differ in the edited grid
+def changed_labels(original, edited, columns):
+    labels = original.index.intersection(edited.index).difference(deleted_rows(original, edited).index)
+    before = original.loc[labels, columns]
+    after = edited.loc[labels, columns]
+    same = (before == after) | (before.isna() & after.isna())
+    return labels[~same.all(axis=1).values].tolist()
+
+
+# Rows added in the editor (data_editor with num_rows="dynamic"), less blank or ticked ones
+def inserted_rows(original, edited, columns, column='Delete'):
+    added = edited.loc[~edited.index.isin(original.index)]
+    added = added[added[column] != True]
+    return added.dropna(how='all', subset=columns)
+
+
+# Bind parameters for executemany, with Python scalars and None for missing values
+def records(df):
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict('records')
+
+
+# executemany parameters for changed rows: new values from the edited grid, keys from the original grid
+def update_params(original, edited, labels, new_columns, key_columns):
+    params = pd.DataFrame({name: edited.loc[labels, col].values for name, col in new_columns.items()})
+    for name, col in key_columns.items():
+        params[name] = original.loc[labels, col].values
+    return records(params)
+
+
+# executemany parameters built from some columns of the rows, e.g. the keys of the rows to delete
+def key_params(rows, key_columns):
+    return records(pd.DataFrame({name: rows[col].values for name, col in key_columns.items()}))
+
+
+# Run every (label, query, params) batch as one executemany in a single transaction.
+# Returns the rows affected per label; nothing is written if any batch fails.
+def apply_batches(engine, batches):
+    summary = {}
+    with engine.begin() as connection:
+        for label, query, params in batches:
+            if not params:
+                summary[label] = 0
+                continue
+            result = connection.execute(query, params)
+            summary[label] = result.rowcount if result.rowcount >= 0 else len(params)
+    return summary
+
+
+# '1 deleted, 2 updated, 0 inserted'
+def format_summary(summary):
+    return ", ".join(f"{count} {label}" for label, count in summary.items())
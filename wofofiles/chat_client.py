@@ -0,0 +1,65 @@
+# Python libraries
+import os
+import json
+import time
+import hashlib
+import threading
+import openai
+
+
+# Directory of the persistent answer cache
+answer_cache_dir = './cache/chat'
+
+# Answers older than this are asked again
+answer_ttl_seconds = 7 * 24 * 3600
+
+# One client per API key for the whole process; it keeps its HTTP connection pool between questions
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key):
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = openai.OpenAI(api_key=api_key)
+        return _clients[api_key]
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+# Cache key of an answer: the normalized question, the dataset version and how it was answered
+def answer_key(query, version, mode, model):
+    raw = json.dumps([normalize_query(query), version, mode, model])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _answer_path(key):
+    return os.path.join(answer_cache_dir, f"{key}.json")
+
+
+def get_cached_answer(key):
+    try:
+        with open(_answer_path(key)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get('time', 0) > answer_ttl_seconds:
+        return None
+    return entry['answer']
+
+
+def put_cached_answer(key, answer, query=None):
+    os.makedirs(answer_cache_dir, exist_ok=True)
+    tmp_path = _answer_path(key) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'time': time.time(), 'query': query, 'answer': answer}, f)
+    os.replace(tmp_path, _answer_path(key))
+
+
+# Text pieces of a streamed chat completion, for st.write_stream
+def stream_text(response):
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
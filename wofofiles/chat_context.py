@@ -0,0 +1,108 @@
+# Python libraries
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+
+# Default size of the data context sent with a chat question
+default_token_budget = 1500
+
+# Rough size of a token in characters, good enough to stay inside the budget
+chars_per_token = 4
+
+# (dataset version, budget, top_k) -> question independent part of the context
+_summaries = OrderedDict()
+_summaries_limit = 32
+_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    return len(text) // chars_per_token + 1
+
+
+def _dimension_columns(df):
+    return [col for col in df.columns
+            if isinstance(df[col].dtype, pd.CategoricalDtype) or df[col].dtype == object]
+
+
+def _numeric_columns(df):
+    return [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+
+
+def schema_section(df):
+    lines = [f"Rows: {len(df)}"]
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]) and len(df):
+            lines.append(f"- {col} ({df[col].dtype}): {df[col].min():%Y-%m-%d} to {df[col].max():%Y-%m-%d}")
+        else:
+            lines.append(f"- {col} ({df[col].dtype})")
+    return "Columns:\n" + "\n".join(lines)
+
+
+def statistics_section(df):
+    numeric = _numeric_columns(df)
+    if not numeric:
+        return ""
+    stats = df[numeric].agg(['sum', 'mean', 'min', 'max']).T.round(2)
+    return "Numeric summary:\n" + stats.to_csv()
+
+
+def top_values_section(df, top_k):
+    lines = []
+    for col in _dimension_columns(df):
+        counts = df[col].value_counts().head(top_k)
+        values = ", ".join(f"{value} ({count})" for value, count in counts.items())
+        lines.append(f"- {col} ({df[col].nunique()} distinct): {values}")
+    return "Most frequent values:\n" + "\n".join(lines) if lines else ""
+
+
+# Rows whose dimension values are mentioned in the question, else the first rows
+def sample_rows(df, question, count):
+    question = (question or "").lower()
+    if question:
+        mask = pd.Series(False, index=df.index)
+        for col in _dimension_columns(df):
+            mentioned = [value for value in df[col].dropna().unique()
+                         if len(str(value)) > 2 and str(value).lower() in question]
+            if mentioned:
+                mask |= df[col].isin(mentioned)
+        if mask.any():
+            return df[mask].head(count)
+    return df.head(count)
+
+
+def _fit(sections, token_budget):
+    text = ""
+    for section in sections:
+        if not section:
+            continue
+        candidate = f"{text}\n\n{section}" if text else section
+        if estimate_tokens(candidate) > token_budget:
+            remaining = (token_budget - estimate_tokens(text)) * chars_per_token
+            if remaining > 200:
+                text = f"{text}\n\n{section[:remaining]}…" if text else f"{section[:remaining]}…"
+            break
+        text = candidate
+    return text
+
+
+# Compact description of a dataset for a chat prompt: schema, statistics, frequent values and matching rows.
+# The question independent part is cached per dataset version; the whole context fits token_budget.
+def build_data_context(df, version, question=None, token_budget=default_token_budget, top_k=5, sample_count=5):
+    key = (version, token_budget, top_k)
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is not None:
+            _summaries.move_to_end(key)
+    if summary is None:
+        summary = _fit([schema_section(df), statistics_section(df), top_values_section(df, top_k)], token_budget)
+        with _lock:
+            _summaries[key] = summary
+            while len(_summaries) > _summaries_limit:
+                _summaries.popitem(last=False)
+
+    remaining = token_budget - estimate_tokens(summary)
+    if remaining <= 0:
+        return summary
+    samples = sample_rows(df.reset_index(drop=True), question, sample_count)
+    return _fit([summary, "Sample rows:\n" + samples.to_csv(index=False)], token_budget)
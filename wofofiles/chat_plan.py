@@ -0,0 +1,199 @@
+# Python libraries
+import json
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# Local imports
+from wofofiles.df_src import add_value_columns
+
+
+# Operations and aggregations a query plan may use
+plan_operators = ('==', '!=', '>', '>=', '<', '<=', 'in', 'between', 'contains')
+plan_aggregations = ('sum', 'mean', 'min', 'max', 'count', 'nunique')
+
+# Largest result table sent back to the model
+max_result_rows = 50
+
+# (dataset version, normalized question) -> (plan, result)
+_results = OrderedDict()
+_results_limit = 128
+_lock = threading.Lock()
+
+
+class PlanError(ValueError):
+    pass
+
+
+plan_instructions = """You translate questions about a sales transactions table into a JSON query plan.
+Reply with JSON only, in this shape:
+{{"filters": [{{"column": "...", "op": "==|!=|>|>=|<|<=|in|between|contains", "value": ...}}],
+ "group_by": ["..."],
+ "metrics": [{{"column": "...", "agg": "sum|mean|min|max|count|nunique", "as": "..."}}],
+ "sort": {{"by": "...", "ascending": false}},
+ "limit": 10}}
+Dates are "YYYY-MM-DD". "between" takes a two item list. SalesValue and ReturnValue are net sales and return amounts.
+Columns:
+{columns}"""
+
+
+# Columns the plan may refer to, including the derived value columns
+def plan_columns(df):
+    return add_value_columns(df.head(0)).dtypes.astype(str).to_dict()
+
+
+def normalize_question(question):
+    return " ".join(question.lower().split())
+
+
+# Ask the model for a plan; client is anything with chat.completions.create (an openai.OpenAI or a stub)
+def request_plan(client, question, columns, model="gpt-4o"):
+    schema = "\n".join(f"- {name} ({dtype})" for name, dtype in columns.items())
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": plan_instructions.format(columns=schema)},
+            {"role": "user", "content": question}
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=400
+    )
+    try:
+        return json.loads(response.choices[0].message.content)
+    except (TypeError, ValueError) as e:
+        raise PlanError(f"The model did not return a valid plan: {e}")
+
+
+def _plan_list(plan, key, item_type, description):
+    items = plan.get(key, [])
+    if not isinstance(items, list) or not all(isinstance(item, item_type) for item in items):
+        raise PlanError(f"'{key}' must be a list of {description}.")
+    return items
+
+
+# Check the shape of the plan and every column, operator and aggregation against the known schema
+def validate_plan(plan, columns):
+    if not isinstance(plan, dict):
+        raise PlanError("The plan must be a JSON object.")
+    for item in _plan_list(plan, 'filters', dict, "objects"):
+        if item.get('column') not in columns:
+            raise PlanError(f"Unknown filter column '{item.get('column')}'.")
+        if item.get('op') not in plan_operators:
+            raise PlanError(f"Unsupported filter operator '{item.get('op')}'.")
+        if item['op'] == 'between' and not (isinstance(item.get('value'), list) and len(item['value']) == 2):
+            raise PlanError("'between' takes a two item list.")
+    for name in _plan_list(plan, 'group_by', str, "column names"):
+        if name not in columns:
+            raise PlanError(f"Unknown group by column '{name}'.")
+    for metric in _plan_list(plan, 'metrics', dict, "objects"):
+        if metric.get('column') not in columns:
+            raise PlanError(f"Unknown metric column '{metric.get('column')}'.")
+        if metric.get('agg') not in plan_aggregations:
+            raise PlanError(f"Unsupported aggregation '{metric.get('agg')}'.")
+        if metric.get('as') is not None and not isinstance(metric['as'], str):
+            raise PlanError("A metric name ('as') must be a string.")
+    sort = plan.get('sort')
+    if sort is not None and not (isinstance(sort, dict) and isinstance(sort.get('by'), (str, type(None)))):
+        raise PlanError("'sort' must be an object with a column name in 'by'.")
+    limit = plan.get('limit')
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        raise PlanError("'limit' must be a positive integer.")
+    return plan
+
+
+def _filter_value(series, value):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if isinstance(value, list):
+            return [pd.Timestamp(item) for item in value]
+        return pd.Timestamp(value)
+    return value
+
+
+def _filter_mask(df, item):
+    series = df[item['column']]
+    value = _filter_value(series, item.get('value'))
+    op = item['op']
+    if op == '==':
+        return series == value
+    if op == '!=':
+        return series != value
+    if op == '>':
+        return series > value
+    if op == '>=':
+        return series >= value
+    if op == '<':
+        return series < value
+    if op == '<=':
+        return series <= value
+    if op == 'in':
+        return series.isin(value if isinstance(value, list) else [value])
+    if op == 'between':
+        return series.between(value[0], value[1])
+    return series.astype(str).str.contains(str(value), case=False, regex=False)
+
+
+# Run a validated plan against the frame with vectorized pandas operations
+def run_plan(df, plan):
+    df = add_value_columns(df.reset_index(drop=True))
+    validate_plan(plan, df.columns)
+    try:
+        return _execute(df, plan)
+    except (TypeError, ValueError, KeyError, IndexError) as e:
+        raise PlanError(f"The plan could not be run: {e}")
+
+
+def _execute(df, plan):
+    for item in plan.get('filters', []):
+        df = df[_filter_mask(df, item)]
+
+    metrics = plan.get('metrics', [])
+    group_by = plan.get('group_by', [])
+    if metrics:
+        named = {metric.get('as') or f"{metric['column']}_{metric['agg']}": (metric['column'], metric['agg'])
+                 for metric in metrics}
+        if group_by:
+            result = df.groupby(group_by, observed=True).agg(**named).reset_index()
+        else:
+            result = pd.DataFrame({name: [df[col].agg(agg)] for name, (col, agg) in named.items()})
+    else:
+        result = df[group_by].drop_duplicates() if group_by else df
+
+    sort = plan.get('sort') or {}
+    if sort.get('by') in result.columns:
+        result = result.sort_values(sort['by'], ascending=bool(sort.get('ascending', False)))
+    limit = min(int(plan.get('limit') or max_result_rows), max_result_rows)
+    return result.head(limit).reset_index(drop=True)
+
+
+# Plan the question with the model, run it locally and cache the result per dataset version
+def plan_and_run(client, df, version, question, model="gpt-4o"):
+    key = (version, normalize_question(question))
+    with _lock:
+        if key in _results:
+            _results.move_to_end(key)
+            return _results[key]
+
+    plan = validate_plan(request_plan(client, question, plan_columns(df), model=model), plan_columns(df))
+    result = run_plan(df, plan)
+    with _lock:
+        _results[key] = (plan, result)
+        while len(_results) > _results_limit:
+            _results.popitem(last=False)
+    return plan, result
+
+
+# Ask the model to phrase an answer from the computed result only
+# with stream=True the raw streaming response is returned for progressive display
+def describe_result(client, question, result, model="gpt-4o", max_tokens=300, stream=False):
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant. Answer using only the result table provided."},
+            {"role": "user", "content": f"Question: {question}\nResult:\n{result.to_csv(index=False)}"}
+        ],
+        max_tokens=max_tokens,
+        stream=stream
+    )
+    if stream:
+        return response
+    return response.choices[0].message.content.strip()
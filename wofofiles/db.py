@@ -0,0 +1,114 @@
+# Python libraries
+import os
+import time
+import threading
+from sqlalchemy import create_engine, event
+
+# Local imports
+from wofofiles.conn import username, password, host, port, database
+from wofofiles.perf import instrument_engine
+
+
+# Pool settings shared by every page in the process
+pool_size = 5
+max_overflow = 10
+pool_timeout = 30
+# RDS drops idle connections, recycle them before that happens
+pool_recycle = 1800
+
+# SQL echo is off unless MEERKAT_SQL_ECHO=1 is set
+sql_echo = os.environ.get('MEERKAT_SQL_ECHO', '0') == '1'
+
+# Create a connection string for the MySQL database
+connection_string = f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
+
+_engine = None
+_engine_lock = threading.Lock()
+
+_stats = {
+    'connects': 0,
+    'connect_seconds': 0.0,
+    'checkouts': 0,
+    'checkins': 0,
+    'held_seconds': 0.0,
+    'max_held_seconds': 0.0,
+    'max_checked_out': 0,
+}
+_stats_lock = threading.Lock()
+
+
+def _register_pool_events(engine):
+
+    @event.listens_for(engine, 'do_connect')
+    def on_do_connect(dialect, conn_rec, cargs, cparams):
+        conn_rec.info['connect_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        started = connection_record.info.pop('connect_started', None)
+        with _stats_lock:
+            _stats['connects'] += 1
+            if started is not None:
+                _stats['connect_seconds'] += time.perf_counter() - started
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        with _stats_lock:
+            _stats['checkouts'] += 1
+            _stats['max_checked_out'] = max(_stats['max_checked_out'], engine.pool.checkedout())
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        with _stats_lock:
+            _stats['checkins'] += 1
+            if checked_out_at is not None:
+                held = time.perf_counter() - checked_out_at
+                _stats['held_seconds'] += held
+                _stats['max_held_seconds'] = max(_stats['max_held_seconds'], held)
+
+
+# One pooled engine per process
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(
+                    connection_string,
+                    echo=sql_echo,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_timeout=pool_timeout,
+                    pool_recycle=pool_recycle,
+                    pool_pre_ping=True,
+                )
+                _register_pool_events(engine)
+                # query durations for the Monitor page
+                instrument_engine(engine)
+                _engine = engine
+    return _engine
+
+
+# Turn SQL logging on or off for the shared engine
+def set_sql_echo(enabled):
+    global sql_echo
+    sql_echo = enabled
+    if _engine is not None:
+        _engine.echo = enabled
+
+
+# Connection pressure on the shared pool
+def pool_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['avg_connect_seconds'] = stats['connect_seconds'] / stats['connects'] if stats['connects'] else 0.0
+    stats['avg_held_seconds'] = stats['held_seconds'] / stats['checkins'] if stats['checkins'] else 0.0
+    if _engine is not None:
+        pool = _engine.pool
+        stats['pool_size'] = pool.size()
+        stats['checked_out'] = pool.checkedout()
+        stats['overflow'] = pool.overflow()
+        stats['idle'] = pool.checkedin()
+    return stats
@@ -1,100 +1,407 @@
 # Python libraries
 import os
-from datetime import datetime, timedelta
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 import pandas as pd
-from sqlalchemy import create_engine, text
-from joblib import Memory
-import datetime as dt
 
 # Local imports
-from wofofiles.conn import username, password, host, port, database
-
-
-# Set up a directory for the cache
-cache_dir = './cache'
-memory = Memory(cache_dir, verbose=0)
-
-# Define the caching function with expiration
-def cache_with_expiry(func, expiry_minutes=10):
-    def wrapper(*args, **kwargs):
-        current_time = datetime.now()
-        cache_file = os.path.join(cache_dir, func.__name__)
-        if os.path.exists(cache_file):
-            cache_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-            if (current_time - cache_time) < timedelta(minutes=expiry_minutes):
-                return memory.cache(func)(*args, **kwargs)
-            else:
-                # Clear the old cache if expired
-                memory.clear()
-        return memory.cache(func)(*args, **kwargs)
-    return wrapper
-
-# Use your existing function but with caching
-@cache_with_expiry
-def dataset():
-    query = """
-    SELECT * FROM ownership
-
-    """
-
-    # Create the connection string and engine
-    connection_string = f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
-    engine = create_engine(connection_string)
-    
-    # Execute the query and return the DataFrame
-    with engine.connect() as connection:
-        df = pd.read_sql(text(query), connection)
+from wofofiles.snapshot import (
+    snapshot, snapshot_lock, snapshot_path, snapshot_version, is_fresh, read_manifest, read_snapshot, write_snapshot
+)
+from wofofiles.incremental import load_incremental
+from wofofiles.perf import span
+
+
+# Registry of named datasets; nothing is loaded until a page asks for it
+_datasets = {}
+_stats = {}
+_stats_lock = threading.Lock()
+# name -> (snapshot, source file) whose version tells whether a loaded frame is still current
+_version_sources = {}
+
+
+# Register a loader under a dataset name
+# version_snapshot (and the source file it is built from) is the snapshot whose version the loaded data follows
+def register_dataset(name, version_snapshot=None, source=None):
+    def decorator(func):
+        _datasets[name] = func
+        _version_sources[name] = (version_snapshot, source)
+        return func
+    return decorator
+
+
+def dataset_names():
+    return list(_datasets)
+
+
+# Load a dataset by name and record what the load cost
+def load_dataset(name):
+    if name not in _datasets:
+        raise KeyError(f"Unknown dataset '{name}'")
+    start = time.perf_counter()
+    with span('load', name):
+        df = _datasets[name]()
+    seconds = time.perf_counter() - start
+
+    with _stats_lock:
+        stats = _stats.setdefault(name, {'loads': 0, 'first_seconds': seconds})
+        stats['loads'] += 1
+        stats['last_seconds'] = seconds
+        stats['loaded_at'] = time.time()
+        stats['rows'] = len(df)
+        stats['memory_bytes'] = int(df.memory_usage(deep=True).sum())
     return df
 
-# Now calling the function will use the cache if available and not expired
-df = dataset()
 
+# Current version of a dataset's data, None when it has no snapshot or its source file changed since the snapshot
+def dataset_version(name):
+    version_snapshot, source = _version_sources.get(name, (None, None))
+    if version_snapshot is None or (source is not None and not is_fresh(version_snapshot, source)):
+        return None
+    return snapshot_version(version_snapshot)
 
 
+# Loaded frames shared by every session: name -> {'loaded_at', 'future', 'version'}
+# datasets without a snapshot (ownership keeps its own refresh interval) are kept for prefetch_ttl_seconds
+prefetch_ttl_seconds = 300
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='df_src_prefetch')
+_prefetched = {}
+_prefetch_lock = threading.Lock()
 
-def daily_transactions():
+
+def _loaded_entry(name, df):
+    loaded = Future()
+    loaded.set_result(df)
+    # the frame's own version when the loader set one, it cannot be newer than the data
+    version = frame_version(df)
+    return {'loaded_at': time.time(), 'future': loaded, 'version': version or dataset_version(name)}
+
+
+def _prefetch(name, entry):
+    df = load_dataset(name)
+    entry['version'] = frame_version(df) or dataset_version(name)
+    return df
+
+
+# A loaded frame is current until the version of its snapshot changes
+def _is_current(name, entry):
+    if not entry['future'].done():
+        return True
+    if _version_sources[name][0] is None:
+        return time.time() - entry['loaded_at'] < prefetch_ttl_seconds
+    return entry['version'] is not None and entry['version'] == dataset_version(name)
+
+
+# Start loading datasets in a background thread pool; loads already running or current are not repeated
+def prefetch_datasets(names):
+    with _prefetch_lock:
+        for name in names:
+            entry = _prefetched.get(name)
+            if entry and _is_current(name, entry):
+                continue
+            entry = {'loaded_at': time.time(), 'version': None}
+            entry['future'] = _prefetch_pool.submit(_prefetch, name, entry)
+            _prefetched[name] = entry
+
+
+# Run a function on the prefetch pool, e.g. to work out which datasets to prefetch off the script thread
+def submit_prefetch(func, *args):
+    return _prefetch_pool.submit(func, *args)
+
+
+# A dataset for a page: the shared frame while it is current, otherwise a fresh load that is shared from then on
+# while a refresh of the dataset runs, the previous frame keeps serving whatever its version.
+# The frame is shared between sessions: the shallow copy lets a page add or replace columns,
+# but values must never be modified in place.
+def get_dataset(name):
+    with _prefetch_lock:
+        entry = _prefetched.get(name)
+        refreshing = name in _refreshes and not _refreshes[name]['future'].done()
+    if entry and (refreshing or _is_current(name, entry)):
+        try:
+            return entry['future'].result().copy(deep=False)
+        except Exception:
+            with _prefetch_lock:
+                if _prefetched.get(name) is entry:
+                    _prefetched.pop(name)
+    df = load_dataset(name)
+    with _prefetch_lock:
+        _prefetched[name] = _loaded_entry(name, df)
+    return df.copy(deep=False)
+
+
+# Background refreshes: name -> {'names', 'future', 'started_at', 'finished_at'}, shared by the datasets of one job
+_refreshes = {}
+
+
+# Reload datasets in the background as one job that publishes them together, so readers never mix
+# an old and a new one; while any of them is already being refreshed, that job is returned instead
+def refresh_datasets(names):
+    names = list(names)
+    for name in names:
+        if name not in _datasets:
+            raise KeyError(f"Unknown dataset '{name}'")
+    with _prefetch_lock:
+        for name in names:
+            job = _refreshes.get(name)
+            if job and not job['future'].done():
+                return job
+        job = {'names': names, 'started_at': time.time(), 'finished_at': None}
+        job['future'] = _prefetch_pool.submit(_run_refresh, names, job)
+        for name in names:
+            _refreshes[name] = job
+        return job
+
+
+def refresh_dataset(name):
+    return refresh_datasets([name])
+
+
+def _run_refresh(names, job):
+    try:
+        frames = {name: load_dataset(name) for name in names}
+        entries = {name: _loaded_entry(name, df) for name, df in frames.items()}
+        # readers see either all the previous frames or all the new ones, never a partial refresh
+        with _prefetch_lock:
+            _prefetched.update(entries)
+        return frames
+    finally:
+        job['finished_at'] = time.time()
+
+
+# State of the last refresh of a dataset, None if it was never refreshed
+# 'expected_seconds' is what the job's loads took last time, to show progress against
+def refresh_status(name):
+    with _prefetch_lock:
+        job = _refreshes.get(name)
+    if job is None:
+        return None
+    running = not job['future'].done()
+    error = None if running else job['future'].exception()
+    with _stats_lock:
+        expected = sum(_stats.get(item, {}).get('last_seconds') or 0 for item in job['names'])
+    return {
+        'running': running,
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'elapsed_seconds': (job['finished_at'] or time.time()) - job['started_at'],
+        'expected_seconds': expected or None,
+        'error': str(error) if error else None,
+    }
+
+
+# Version of the data a loaded frame was built from (set by the snapshot backed datasets)
+def frame_version(df):
+    return df.attrs.get('version')
+
+
+# Load cost per dataset, for the pages that want to show it
+def dataset_stats():
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+# The ownership table is kept in a local snapshot and refreshed with only the rows past its watermark
+@register_dataset('ownership')
+def dataset(full=False):
+    return load_incremental('ownership', 'ownership', full=full)
+
+# The ownership table used to be loaded into df at import; keep the name but load it on first access
+def __getattr__(name):
+    if name == 'df':
+        return get_dataset('ownership')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Source workbook for the daily transactions
+daily_transactions_source = 'draft/data_sample.xlsx'
+
+
+# Column mapping of the daily transaction extracts
+daily_transactions_drop = ['TRNS_TYPE_CODE', 'TRNS_SERIAL', 'ITEM_NAME']
+daily_transactions_fill = {'CUSTOMER_NAME': 'Walk-in', 'LIST_RATE': 0}
+daily_transactions_columns = {
+    'INVOICE_NO': 'TransactionNumber',
+    'INVOICE_DATE': 'TransactionDate',
+    'INVOICE_TIME': 'TransactionTime',
+    'INSERT_USER': 'UserCode',
+    'USER_NAME': 'UserName',
+    'STORE_CODE': 'StoreCode',
+    'STORE_NAME': 'StoreName',
+    'CUSTOMER_CODE': 'CustomerCode',
+    'CUSTOMER_NAME': 'CustomerName',
+    'ITEM_GROUP_CODE': 'GroupCode',
+    'GROUP_NAME': 'GroupName',
+    'ITEM_CODE': 'ItemCode',
+    'ITEM_NAME_E': 'ItemNameEn',
+    'SALES_PRICE': 'SalesPrice',
+    'DISC1_VALUE': 'DiscountValue',
+    'SALES_QTY': 'SalesQuantity',
+    'RETURN_QTY': 'ReturnQuantity',
+    'LIST_RATE': 'ListRate',
+    'EXPIRY_DATE': 'ExpiryDate',
+    'THEMAR_CUST_MOBILE': 'CustomerMobile',
+    'UNIT_COST': 'UnitCost'
+}
+
+
+# Drop, fill and rename the raw extract columns in one pass each
+def clean_daily_transactions(df):
+    df = df.drop(columns=daily_transactions_drop, errors='ignore')
+    df = df.fillna({col: value for col, value in daily_transactions_fill.items() if col in df.columns})
+    return df.rename(columns=daily_transactions_columns)
+
+
+def read_daily_transactions():
 
     # Import the data
-    df = pd.read_excel('draft/data_sample.xlsx')
-    df.drop(['TRNS_TYPE_CODE', 'TRNS_SERIAL', 'ITEM_NAME'], axis=1, inplace=True)
-    df['CUSTOMER_NAME'].fillna('Walk-in', inplace=True)
-    df['LIST_RATE'].fillna(0, inplace=True) 
-
-    # rename columns
-    df.rename(columns={
-        'INVOICE_NO': 'TransactionNumber',
-        'INVOICE_DATE': 'TransactionDate',
-        'INVOICE_TIME': 'TransactionTime',
-        'INSERT_USER': 'UserCode',
-        'USER_NAME': 'UserName',
-        'STORE_CODE': 'StoreCode',
-        'STORE_NAME': 'StoreName',
-        'CUSTOMER_CODE': 'CustomerCode',
-        'CUSTOMER_NAME': 'CustomerName',
-        'ITEM_GROUP_CODE': 'GroupCode',
-        'GROUP_NAME': 'GroupName',
-        'ITEM_CODE': 'ItemCode',
-        'ITEM_NAME_E': 'ItemNameEn',
-        'SALES_PRICE': 'SalesPrice',
-        'DISC1_VALUE': 'DiscountValue',
-        'SALES_QTY': 'SalesQuantity',
-        'RETURN_QTY': 'ReturnQuantity',
-        'LIST_RATE': 'ListRate',
-        'EXPIRY_DATE': 'ExpiryDate',
-        'THEMAR_CUST_MOBILE': 'CustomerMobile',
-        'UNIT_COST': 'UnitCost'
-    }, inplace=True)
+    df = pd.read_excel(daily_transactions_source)
+
+    return clean_daily_transactions(df)
+
+
+@register_dataset('daily_transactions', 'daily_transactions', daily_transactions_source)
+def daily_transactions():
+    # the workbook is parsed once into a columnar snapshot and re-parsed only when it changes
+    return snapshot('daily_transactions', daily_transactions_source, read_daily_transactions)
+
+
+# Extracts consolidated by `python -m wofofiles.ingest <folder>`
+# until ingest has run there is no snapshot, and the dataset is empty with the cleaned extract columns
+@register_dataset('daily_extracts', 'daily_extracts')
+def daily_extracts():
+    if read_manifest('daily_extracts') is None or not os.path.exists(snapshot_path('daily_extracts')):
+        return pd.DataFrame(columns=[col for raw, col in daily_transactions_columns.items()
+                                     if raw not in daily_transactions_drop])
+    return read_snapshot('daily_extracts')
+
+
+# Dimension columns stored as categoricals in the transactions frame
+dimension_columns = ['StoreName', 'CustomerName', 'UserName', 'GroupName', 'ItemNameEn']
+
+
+# Smallest numeric dtype that holds the column without losing values
+def downcast_numeric(series):
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if len(values) == len(series) and (values == values.round()).all():
+            return pd.to_numeric(series, downcast='integer')
+        as_float32 = series.astype('float32')
+        if (as_float32.astype('float64') == series).where(series.notna(), True).all():
+            return as_float32
+    return series
+
+
+# Invoice dates of the extracts are day-first text
+def parse_transaction_dates(dates):
+    return pd.to_datetime(dates, format='%d-%m-%Y', dayfirst=True)
+
+
+# Canonical transactions frame: parsed dates, categorical dimensions, downcast numerics
+# rows are stored in (StoreName, TransactionDate) order so re-indexing after a load is cheap
+def build_transactions():
+    df = daily_transactions()
+    df['TransactionDate'] = parse_transaction_dates(df['TransactionDate'])
+    for col in dimension_columns:
+        df[col] = df[col].astype('category')
+    for col in df.columns[df.dtypes.map(pd.api.types.is_numeric_dtype).values]:
+        df[col] = downcast_numeric(df[col])
+    return index_by_store_date(df).reset_index(drop=True)
+
+
+# Store level of the index for rows without a store name
+missing_store = ''
+
+
+# Sort by (StoreName, TransactionDate) and index on it, so store/date selections are binary searches
+# the rows are sorted on the index level itself, so a missing store sorts like any other name
+# the levels are unnamed so groupby('StoreName') still refers to the column
+def index_by_store_date(df):
+    stores = df['StoreName'].astype(object)
+    stores = stores.where(stores.notna(), missing_store).astype(str)
+    index = pd.MultiIndex.from_arrays([stores.values, df['TransactionDate'].values])
+    return df.set_axis(index, axis=0).sort_index(kind='stable')
 
+
+# Rows of one store between two dates (inclusive), sliced from the sorted index without a full scan
+def slice_transactions(df, store, start, end):
+    start_pos, end_pos = df.index.slice_locs((store, pd.Timestamp(start)), (store, pd.Timestamp(end)))
+    return df.iloc[start_pos:end_pos]
+
+
+@register_dataset('transactions', 'transactions', daily_transactions_source)
+def transactions():
+    # the typed frame is snapshotted too, so categoricals and dates survive without re-parsing
+    df = index_by_store_date(snapshot('transactions', daily_transactions_source, build_transactions))
+    df.attrs['version'] = snapshot_version('transactions')
     return df
 
 
+# Net sales value and return value of every line, computed in float64 even when the frame stores downcast columns
+def add_value_columns(data):
+    net_price = data['SalesPrice'].astype('float64') - data['DiscountValue'].astype('float64')
+    return data.assign(
+        SalesValue=net_price * data['SalesQuantity'].astype('float64'),
+        ReturnValue=net_price * data['ReturnQuantity'].astype('float64')
+    )
+
+
+# Dimensions and measures of the daily rollup cube
+cube_dimensions = ['StoreName', 'GroupName', 'UserName', 'CustomerName']
+cube_measures = ['SalesValue', 'ReturnValue', 'SalesQuantity', 'ReturnQuantity']
+
+
+# One row per day x store x group x user x customer
+def build_daily_cube(df):
+    df = add_value_columns(df)
+    day = df['TransactionDate'].dt.normalize().rename('TransactionDate')
+    # dropna=False keeps lines with a missing store, group, user or customer in the totals
+    cube = df.groupby([day] + cube_dimensions, observed=True, dropna=False)[cube_measures].sum().reset_index()
+    return cube
+
+
+@register_dataset('daily_cube', 'transactions', daily_transactions_source)
+def daily_cube(full=False):
+    # the invoice lines are only read when the transactions snapshot is stale or the cube has to be rolled up again
+    df = None if is_fresh('transactions', daily_transactions_source) else transactions()
+    version = snapshot_version('transactions') if df is None else frame_version(df)
+    with snapshot_lock('daily_cube'):
+        manifest = read_manifest('daily_cube')
+        if full or manifest is None or manifest.get('transactions_version') != version:
+            if df is None:
+                df = transactions()
+                version = frame_version(df)
+            # the workbook is replaced as a whole, so any day may have changed: roll up every line again
+            cube = build_daily_cube(df)
+            write_snapshot('daily_cube', cube, meta={'transactions_version': version})
+        else:
+            cube = read_snapshot('daily_cube')
+    cube = index_by_store_date(cube)
+    # the cube is as current as the transactions it was rolled up from
+    cube.attrs['version'] = version
+    return cube
+
+
+# Memory used per column, with the total in the last row
+def memory_report(df):
+    usage = df.memory_usage(deep=True, index=True)
+    report = pd.DataFrame({
+        'dtype': [str(df.index.dtype) if col == 'Index' else str(df[col].dtype) for col in usage.index],
+        'memory_bytes': usage.values
+    }, index=usage.index)
+    total_row = pd.DataFrame({'dtype': [''], 'memory_bytes': [usage.sum()]}, index=['Total'])
+    return pd.concat([report, total_row])
+
+
+@register_dataset('returns_report', 'transactions', daily_transactions_source)
 def returns_report():
-    # copy of daily transactions dataframe
-    df = daily_transactions()
-    # convert TransactionDate to datetime
-    df['TransactionDate'] = pd.to_datetime(df['TransactionDate'], format='%d-%m-%Y', dayfirst=True)
+    # copy of the typed transactions dataframe, dates are already parsed
+    df = transactions()
     # drop unnecessary columns
     df.drop(['UserCode', 'StoreCode', 'CustomerCode', 'GroupCode', 'ItemCode', 'CustomerMobile', 'UnitCost'], axis=1, inplace=True)
+    # keeps the version attribute of transactions()
 
     return df
-
@@ -0,0 +1,198 @@
+# Python libraries
+import os
+import time
+import tempfile
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+
+# Local imports
+from wofofiles.db import get_engine
+from wofofiles.snapshot import (
+    snapshot_lock, snapshot_path, read_manifest, read_snapshot, write_snapshot_chunks, update_manifest
+)
+
+
+# How often a table is checked for new rows
+refresh_interval_seconds = 600
+
+# Rows fetched from the server-side cursor per chunk
+chunk_size = 50000
+
+# MySQL column types -> Arrow types of the snapshot
+_int_types = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint', 'year', 'bit'}
+_float_types = {'decimal', 'numeric', 'float', 'double'}
+_datetime_types = {'date', 'datetime', 'timestamp'}
+_binary_types = {'binary', 'varbinary', 'tinyblob', 'blob', 'mediumblob', 'longblob'}
+
+
+# Column definitions of a table, in SELECT * order
+def table_columns(connection, table):
+    return connection.execute(text("""
+        SELECT COLUMN_NAME, COLUMN_KEY, EXTRA, DATA_TYPE
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+        ORDER BY ORDINAL_POSITION
+    """), {'table': table}).fetchall()
+
+
+# Pick the high-water mark column of a table: an ON UPDATE timestamp, else the auto-increment key
+def discover_watermark(columns):
+    keys = [col.COLUMN_NAME for col in columns if col.COLUMN_KEY == 'PRI']
+    for col in columns:
+        if 'on update' in col.EXTRA.lower():
+            return col.COLUMN_NAME, 'timestamp', keys
+    for col in columns:
+        if 'auto_increment' in col.EXTRA.lower():
+            return col.COLUMN_NAME, 'increment', keys
+    return None, None, keys
+
+
+# Arrow schema of the snapshot, fixed up front so every chunk gets the same types
+def arrow_schema(columns):
+    fields = []
+    for col in columns:
+        data_type = col.DATA_TYPE.lower()
+        if data_type in _int_types:
+            arrow_type = pa.int64()
+        elif data_type in _float_types:
+            arrow_type = pa.float64()
+        elif data_type in _datetime_types:
+            arrow_type = pa.timestamp('us')
+        elif data_type == 'time':
+            arrow_type = pa.duration('us')
+        elif data_type in _binary_types:
+            arrow_type = pa.binary()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(col.COLUMN_NAME, arrow_type))
+    return pa.schema(fields)
+
+
+# Convert one chunk to the snapshot's column types
+def conform_chunk(chunk, schema):
+    for field in schema:
+        col = field.name
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+        elif pa.types.is_timestamp(field.type):
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+        elif pa.types.is_duration(field.type):
+            chunk[col] = pd.to_timedelta(chunk[col], errors='coerce')
+        elif pa.types.is_string(field.type):
+            chunk[col] = chunk[col].astype('string')
+    return chunk
+
+
+# Stream a query through a server-side cursor, one typed chunk at a time
+def read_chunks(connection, query, schema, params=None):
+    streaming = connection.execution_options(stream_results=True, max_row_buffer=chunk_size)
+    for chunk in pd.read_sql(text(query), streaming, params=params, chunksize=chunk_size):
+        yield conform_chunk(chunk, schema)
+
+
+# Watermarks are kept in the JSON manifest
+def _json_value(value):
+    if isinstance(value, pd.Timestamp):
+        return str(value)
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+# Full table read streamed straight into the snapshot; returns rows fetched and the new watermark
+def _full_load(connection, name, table, schema, column):
+    state = {'watermark': None}
+
+    def chunks():
+        for chunk in read_chunks(connection, f"SELECT * FROM `{table}`", schema):
+            if column and not chunk.empty:
+                chunk_max = chunk[column].max()
+                if state['watermark'] is None or chunk_max > state['watermark']:
+                    state['watermark'] = chunk_max
+            yield chunk
+
+    manifest = write_snapshot_chunks(name, chunks(), schema)
+    return manifest['rows'], state['watermark']
+
+
+# Stream the rows past the watermark into a spool file; timestamps use >= so rows updated in the same second are re-read.
+# Only their keys stay in memory. Returns rows fetched, the keys and the new watermark.
+def _spool_delta(connection, table, schema, column, kind, watermark, keys, spool_path):
+    op = '>=' if kind == 'timestamp' else '>'
+    query = f"SELECT * FROM `{table}` WHERE `{column}` {op} :watermark"
+    rows, key_frames, new_watermark = 0, [], None
+    with pa.OSFile(spool_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for chunk in read_chunks(connection, query, schema, params={'watermark': watermark}):
+                if chunk.empty:
+                    continue
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False).replace_schema_metadata(schema.metadata))
+                rows += len(chunk)
+                key_frames.append(chunk[keys])
+                chunk_max = chunk[column].max()
+                if new_watermark is None or chunk_max > new_watermark:
+                    new_watermark = chunk_max
+    delta_keys = pd.MultiIndex.from_frame(pd.concat(key_frames, ignore_index=True)) if key_frames else None
+    return rows, delta_keys, new_watermark
+
+
+# Record batches of an Arrow file, cast to the snapshot's schema, one at a time
+def _file_batches(path, schema):
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield pa.Table.from_batches([reader.get_batch(i)]).select(schema.names).cast(schema)
+
+
+# The snapshot with the rows of changed keys dropped, then the delta: the newest version of a key wins.
+# Streamed batch by batch, so the table is never held in memory whole.
+def _merged_batches(name, schema, keys, delta_keys, spool_path):
+    for batch in _file_batches(snapshot_path(name), schema):
+        stale = pd.MultiIndex.from_frame(batch.select(keys).to_pandas()).isin(delta_keys)
+        yield batch.filter(pa.array(~stale))
+    yield from _file_batches(spool_path, schema)
+
+
+# Keep a local snapshot of a table in sync by fetching only rows past its high-water mark.
+# Deleted rows are only dropped by a full refresh (full=True).
+def load_incremental(name, table, full=False):
+    with snapshot_lock(name):
+        manifest = read_manifest(name)
+        if not full and manifest and time.time() - manifest.get('refreshed_at', 0) < refresh_interval_seconds:
+            return read_snapshot(name)
+
+        with get_engine().connect() as connection:
+            columns = table_columns(connection, table)
+            schema = arrow_schema(columns)
+
+            # no watermark yet (no such column, or the table was empty at the last full load): read it all
+            if full or manifest is None or manifest.get('watermark_column') is None or manifest.get('watermark') is None:
+                column, kind, keys = discover_watermark(columns)
+                fetched, watermark = _full_load(connection, name, table, schema, column)
+            else:
+                column, kind, keys = manifest['watermark_column'], manifest['watermark_kind'], manifest['key_columns']
+                fd, spool_path = tempfile.mkstemp(dir=os.path.dirname(snapshot_path(name)), prefix=f"{name}.delta.", suffix='.tmp')
+                os.close(fd)
+                try:
+                    # without a primary key a row is matched on all of its columns
+                    fetched, delta_keys, watermark = _spool_delta(
+                        connection, table, schema, column, kind, manifest['watermark'], keys or schema.names, spool_path)
+                    if not fetched:
+                        update_manifest(name, refreshed_at=time.time(), rows_fetched=0)
+                        return read_snapshot(name)
+                    write_snapshot_chunks(name, _merged_batches(name, schema, keys or schema.names, delta_keys, spool_path), schema)
+                finally:
+                    os.remove(spool_path)
+
+        update_manifest(
+            name,
+            table=table,
+            watermark_column=column,
+            watermark_kind=kind,
+            key_columns=keys,
+            watermark=_json_value(watermark) if watermark is not None else None,
+            refreshed_at=time.time(),
+            rows_fetched=fetched,
+        )
+        return read_snapshot(name)
@@ -0,0 +1,106 @@
+# Python libraries
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# Local imports
+from wofofiles.df_src import clean_daily_transactions, parse_transaction_dates
+from wofofiles.snapshot import snapshot_lock, snapshot_path, read_manifest, read_snapshot, write_snapshot
+
+
+# File types the extract folder may contain
+extract_extensions = ('.xlsx', '.xls', '.csv')
+
+
+# All extract files under a directory, in a stable order
+def discover_extracts(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(extract_extensions) and not name.startswith('~$'):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+# One parse task per worksheet, so a multi-sheet workbook is spread over the pool too
+def extract_tasks(paths):
+    tasks = []
+    for path in paths:
+        if path.lower().endswith('.csv'):
+            tasks.append((path, None))
+        else:
+            with pd.ExcelFile(path) as workbook:
+                tasks.extend((path, sheet) for sheet in workbook.sheet_names)
+    return tasks
+
+
+# Parse and clean a single sheet or CSV file (runs in a worker process)
+def parse_extract(task):
+    path, sheet = task
+    if sheet is None:
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path, sheet_name=sheet)
+    return clean_daily_transactions(df)
+
+
+# Parse every extract under directory in a process pool and write one consolidated snapshot
+# append=True only parses files the snapshot does not list yet and adds their rows to it;
+# extracts are append-only there, so a new file may not hold a day older than the snapshot's last day
+def ingest_directory(directory, name='daily_extracts', workers=None, append=False):
+    start = time.perf_counter()
+    paths = discover_extracts(directory)
+    if not paths:
+        raise FileNotFoundError(f"No extract files found in '{directory}'")
+
+    with snapshot_lock(name):
+        previous = read_manifest(name) if append and os.path.exists(snapshot_path(name)) else None
+        known = previous.get('extract_files', []) if previous else []
+        new_paths = [path for path in paths if path not in known]
+        tasks = extract_tasks(new_paths)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = [df for df in pool.map(parse_extract, tasks) if not df.empty]
+
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if previous is not None:
+            existing = read_snapshot(name)
+            if not df.empty and not existing.empty:
+                since = parse_transaction_dates(existing['TransactionDate']).max()
+                older = parse_transaction_dates(df['TransactionDate']) < since
+                if older.any():
+                    raise ValueError(f"{int(older.sum())} rows of the new extracts are older than "
+                                     f"{since:%d-%m-%Y}; run a full ingest to replace the snapshot")
+            df = pd.concat([existing, df], ignore_index=True) if not df.empty else existing
+        manifest = write_snapshot(name, df, meta={
+            'extract_files': known + new_paths,
+            'extract_sheets': (previous.get('extract_sheets', 0) if previous else 0) + len(tasks)
+        })
+    manifest['seconds'] = time.perf_counter() - start
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest daily transaction extracts into one snapshot.")
+    parser.add_argument('directory', help="folder with the .xlsx/.xls/.csv extracts")
+    parser.add_argument('--name', default='daily_extracts', help="snapshot name (default: daily_extracts)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--append', action='store_true', help="only add files not ingested yet (no older days)")
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = ingest_directory(args.directory, name=args.name, workers=args.workers, append=args.append)
+    except (FileNotFoundError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    print(f"{manifest['rows']} rows from {len(manifest['extract_files'])} files "
+          f"({manifest['extract_sheets']} sheets) -> {args.name} in {manifest['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
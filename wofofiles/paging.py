@@ -0,0 +1,50 @@
+# Python libraries
+import math
+import streamlit as st
+from sqlalchemy import text
+
+
+# Rows shown per grid page
+page_size = 50
+
+
+# Escape the LIKE wildcards so the search text matches literally (backslash is MySQL's default LIKE escape)
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Search box for a grid; returns the SQL LIKE pattern and resets paging when the search changes
+def search_box(key):
+    search = st.text_input("Search 🔍", key=f"{key}_search").strip()
+    if st.session_state.get(f"{key}_last_search") != search:
+        st.session_state[f"{key}_last_search"] = search
+        st.session_state[f"{key}_page"] = 1
+    return f"%{escape_like(search)}%"
+
+
+# Page selector under a grid; returns LIMIT and OFFSET for the current page
+def page_selector(key, total):
+    pages = max(1, math.ceil(total / page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    with col2:
+        st.caption(f"{total} rows · page {page} of {pages}")
+    return page_size, (page - 1) * page_size
+
+
+# Count the matching rows, then fetch only the current page of select_sql (which must end with ORDER BY)
+def fetch_page(connection, select_sql, count_sql, params, key):
+    total = connection.execute(text(count_sql), params).scalar()
+    limit, offset = page_selector(key, total)
+    query = text(f"{select_sql} LIMIT :limit OFFSET :offset")
+    return connection.execute(query, {**params, 'limit': limit, 'offset': offset}).fetchall()
+
+
+# data_editor key for the rows on screen: edits made on one page or search are never applied to another's rows
+def editor_key(key):
+    return f"editable_{key}_{st.session_state.get(f'{key}_page', 1)}_{st.session_state.get(f'{key}_last_search', '')}"
@@ -0,0 +1,155 @@
+# Python libraries
+import os
+import time
+import logging
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+import pandas as pd
+from sqlalchemy import event
+
+
+# Rotating log of every span; MEERKAT_PERF_LOG= (empty) keeps timings in memory only
+perf_log_path = os.environ.get('MEERKAT_PERF_LOG', './logs/perf.log')
+perf_log_bytes = 5 * 1024 * 1024
+perf_log_backups = 5
+
+# Spans and reruns kept in memory for the Monitor page
+_spans = deque(maxlen=5000)
+_reruns = deque(maxlen=200)
+_lock = threading.Lock()
+# the rerun being recorded on this thread (Streamlit runs each script rerun on its own thread)
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_perf_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                logger = logging.getLogger('meerkat.perf')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                if perf_log_path and not logger.handlers:
+                    os.makedirs(os.path.dirname(perf_log_path) or '.', exist_ok=True)
+                    handler = RotatingFileHandler(perf_log_path, maxBytes=perf_log_bytes, backupCount=perf_log_backups)
+                    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                    logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+
+def record_span(kind, name, seconds, started_at=None, error=None):
+    span = {
+        'kind': kind,
+        'name': name,
+        'seconds': seconds,
+        'started_at': started_at if started_at is not None else time.time() - seconds,
+        'thread': threading.current_thread().name,
+        'error': error,
+    }
+    with _lock:
+        _spans.append(span)
+    current = getattr(_local, 'rerun', None)
+    if current is not None:
+        current['spans'].append(span)
+    get_perf_logger().info("%s %s %.4fs%s", kind, name, seconds, f" error={error}" if error else "")
+    return span
+
+
+# Time a block: with span('load', 'transactions'): ...
+@contextmanager
+def span(kind, name):
+    started_at = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record_span(kind, name, time.perf_counter() - start, started_at, error)
+
+
+# Decorator form of span; the name defaults to the function name
+def timed(kind, name=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Record one script rerun of a page with every span measured on its thread
+@contextmanager
+def rerun(page, user=None):
+    current = {'page': page, 'user': user, 'started_at': time.time(), 'spans': []}
+    previous = getattr(_local, 'rerun', None)
+    _local.rerun = current
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current['seconds'] = time.perf_counter() - start
+        _local.rerun = previous
+        with _lock:
+            _reruns.append(current)
+        get_perf_logger().info("rerun %s %.4fs (%d spans)", page, current['seconds'], len(current['spans']))
+
+
+# Time every statement the engine runs
+def instrument_engine(engine, statement_chars=120):
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append((time.time(), time.perf_counter()))
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        started_at, start = started.pop()
+        record_span('query', " ".join(statement.split())[:statement_chars], time.perf_counter() - start, started_at)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def recent_spans(limit=None):
+    with _lock:
+        spans = list(_spans)
+    return spans[-limit:] if limit else spans
+
+
+def recent_reruns(limit=None):
+    with _lock:
+        reruns = list(_reruns)
+    return reruns[-limit:] if limit else reruns
+
+
+# Count, total, mean and max seconds per (kind, name), slowest total first
+def span_summary(spans=None):
+    spans = recent_spans() if spans is None else spans
+    if not spans:
+        return pd.DataFrame(columns=['kind', 'name', 'count', 'total_seconds', 'mean_seconds', 'max_seconds'])
+    df = pd.DataFrame(spans)
+    summary = df.groupby(['kind', 'name'])['seconds'].agg(['count', 'sum', 'mean', 'max']).reset_index()
+    summary.columns = ['kind', 'name', 'count', 'total_seconds', 'mean_seconds', 'max_seconds']
+    return summary.sort_values('total_seconds', ascending=False).reset_index(drop=True)
+
+
+def clear_spans():
+    with _lock:
+        _spans.clear()
+        _reruns.clear()
@@ -0,0 +1,170 @@
+# Python libraries
+import os
+import sys
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict, Counter
+import pandas as pd
+
+
+# Bounds of the in-memory cache shared by every session of the process
+max_entries = 256
+max_bytes = 256 * 1024 * 1024
+
+# Directory for results computed with persist=True, so they survive a restart
+result_cache_dir = './cache/results'
+
+# key -> (size in bytes, value)
+_entries = OrderedDict()
+_total_bytes = 0
+_key_locks = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+# How often each (report code, filter parameters) was asked for, for the warm-up scheduler
+# past max_usage_keys the least used half is forgotten
+max_usage_keys = 2000
+_usage = Counter()
+_usage_params = {}
+
+
+# Cache key of a report result: report code, filter parameters and dataset version
+def result_key(code, params, version):
+    raw = json.dumps([code, params, version], default=str, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# Approximate memory held by a cached value
+def size_of(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sum(size_of(item) for item in value.values()) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sum(size_of(item) for item in value) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+def _key_lock(key):
+    with _lock:
+        if key not in _key_locks:
+            _key_locks[key] = threading.Lock()
+        return _key_locks[key]
+
+
+def _get(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        _entries.move_to_end(key)
+        return entry
+
+
+def _put(key, value):
+    global _total_bytes
+    size = size_of(value)
+    with _lock:
+        if key in _entries:
+            _total_bytes -= _entries[key][0]
+        _entries[key] = (size, value)
+        _entries.move_to_end(key)
+        _total_bytes += size
+        # least recently used results go first
+        while len(_entries) > 1 and (len(_entries) > max_entries or _total_bytes > max_bytes):
+            old_key, (old_size, _) = _entries.popitem(last=False)
+            _key_locks.pop(old_key, None)
+            _total_bytes -= old_size
+            _stats['evictions'] += 1
+
+
+def _disk_path(key):
+    return os.path.join(result_cache_dir, f"{key}.pkl")
+
+
+def _read_disk(key):
+    try:
+        with open(_disk_path(key), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def _write_disk(key, value):
+    os.makedirs(result_cache_dir, exist_ok=True)
+    tmp_path = _disk_path(key) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, _disk_path(key))
+
+
+# Return the cached result for (code, params, version), computing it once across all sessions.
+# Concurrent callers of the same key wait for the first one; results are shared and must not be modified.
+# track_usage=False keeps background warm-ups out of the usage counts.
+def cached_result(code, params, version, compute, persist=False, refresh=False, track_usage=True):
+    key = result_key(code, params, version)
+    if track_usage:
+        usage_key = (code, json.dumps(params, default=str, sort_keys=True))
+        with _lock:
+            _usage[usage_key] += 1
+            _usage_params[usage_key] = params
+            if len(_usage) > max_usage_keys:
+                kept = dict(_usage.most_common(max_usage_keys // 2))
+                _usage.clear()
+                _usage.update(kept)
+                for old_key in set(_usage_params) - set(kept):
+                    del _usage_params[old_key]
+    if not refresh:
+        entry = _get(key)
+        if entry is not None:
+            with _lock:
+                _stats['hits'] += 1
+            return entry[1]
+
+    with _key_lock(key):
+        if not refresh:
+            entry = _get(key)
+            if entry is not None:
+                with _lock:
+                    _stats['hits'] += 1
+                return entry[1]
+            if persist:
+                value = _read_disk(key)
+                if value is not None:
+                    _put(key, value)
+                    with _lock:
+                        _stats['disk_hits'] += 1
+                    return value
+
+        value = compute()
+        _put(key, value)
+        if persist:
+            _write_disk(key, value)
+        with _lock:
+            _stats['misses'] += 1
+        return value
+
+
+# Filter parameters of a report, most asked for first
+def most_used_params(code, limit=5):
+    with _lock:
+        ranked = [usage_key for usage_key, _ in _usage.most_common() if usage_key[0] == code]
+        return [_usage_params[usage_key] for usage_key in ranked[:limit]]
+
+
+# Hit/miss counters and current size of the cache
+def result_cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries), bytes=_total_bytes)
+
+
+def clear_result_cache():
+    global _total_bytes
+    with _lock:
+        _entries.clear()
+        _key_locks.clear()
+        _total_bytes = 0
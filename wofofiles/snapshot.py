@@ -0,0 +1,194 @@
+# Python libraries
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# Set up a directory for the columnar snapshots
+snapshot_dir = './cache/snapshots'
+
+# Compression codec for the snapshot files (lz4 decompresses fastest, zstd is smaller)
+# None writes uncompressed files, which are then read through a memory map instead of into the heap
+snapshot_compression = 'lz4'
+
+# One lock per snapshot name so two reruns don't rebuild the same file at once
+# re-entrant, since snapshot() checks is_fresh() while it holds the lock
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def snapshot_lock(name):
+    with _locks_guard:
+        if name not in _locks:
+            _locks[name] = threading.RLock()
+        return _locks[name]
+
+
+# Paths of the snapshot file and its manifest
+def snapshot_path(name):
+    return os.path.join(snapshot_dir, f"{name}.arrow")
+
+
+def manifest_path(name):
+    return os.path.join(snapshot_dir, f"{name}.json")
+
+
+# Hash the source file in chunks so large extracts don't load into memory
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(name):
+    try:
+        with open(manifest_path(name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Write a file through a temp file next to it, then swap it in.
+# Every writer gets its own temp file: the app's threads, the warm-up and ingest processes may write at once.
+def _replace_with(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_manifest(name, manifest):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+    _replace_with(manifest_path(name), write)
+
+
+# Update fields of a snapshot's manifest without rewriting the data
+def update_manifest(name, **fields):
+    manifest = read_manifest(name) or {'name': name}
+    manifest.update(fields)
+    _write_manifest(name, manifest)
+    return manifest
+
+
+# Convert a DataFrame to an Arrow table, falling back to strings for mixed object columns
+def _to_table(df):
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].astype('string')
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+# Write a DataFrame as a compressed Arrow IPC file and record its source signature
+# meta is stored in the manifest, e.g. the version of the data a derived snapshot was built from
+def write_snapshot(name, df, source=None, meta=None):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    table = _to_table(df)
+    _replace_with(snapshot_path(name), lambda tmp_path: feather.write_feather(
+        table, tmp_path, compression=snapshot_compression or 'uncompressed'))
+
+    manifest = {
+        'name': name,
+        'rows': table.num_rows,
+        'built_at': time.time(),
+        'version': None,
+        'source': source,
+    }
+    if source and os.path.exists(source):
+        stat = os.stat(source)
+        manifest['source_mtime'] = stat.st_mtime
+        manifest['source_size'] = stat.st_size
+        manifest['source_hash'] = file_hash(source)
+        manifest['version'] = manifest['source_hash'][:16]
+    else:
+        manifest['version'] = f"{manifest['built_at']:.6f}"
+    if meta:
+        manifest.update(meta)
+    _write_manifest(name, manifest)
+    return manifest
+
+
+# Stream DataFrame chunks (or Arrow tables already in schema) into a snapshot one record batch at a time,
+# so only one chunk is ever in memory
+def write_snapshot_chunks(name, chunks, schema, meta=None):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    options = pa.ipc.IpcWriteOptions(compression=snapshot_compression)
+    rows = 0
+
+    def write(tmp_path):
+        nonlocal rows
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema, options=options) as writer:
+                for chunk in chunks:
+                    if not isinstance(chunk, pa.Table):
+                        chunk = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                    batch = chunk.replace_schema_metadata(schema.metadata)
+                    writer.write_table(batch)
+                    rows += batch.num_rows
+
+    _replace_with(snapshot_path(name), write)
+
+    built_at = time.time()
+    manifest = {'name': name, 'rows': rows, 'built_at': built_at, 'version': f"{built_at:.6f}", 'source': None}
+    if meta:
+        manifest.update(meta)
+    _write_manifest(name, manifest)
+    return manifest
+
+
+# Load a snapshot; only the selected columns are read.
+# A memory map only helps uncompressed files: compressed buffers are decompressed into the heap anyway.
+def read_snapshot(name, columns=None):
+    table = feather.read_table(snapshot_path(name), columns=columns, memory_map=snapshot_compression is None)
+    return table.to_pandas()
+
+
+# Check whether the snapshot still matches its source file
+# the manifest may be rewritten here, so the snapshot's lock is held like for any other write
+def is_fresh(name, source):
+    with snapshot_lock(name):
+        manifest = read_manifest(name)
+        if manifest is None or not os.path.exists(snapshot_path(name)):
+            return False
+        if not os.path.exists(source):
+            # Keep serving the last snapshot if the source went away
+            return True
+        stat = os.stat(source)
+        if stat.st_mtime == manifest.get('source_mtime') and stat.st_size == manifest.get('source_size'):
+            return True
+        # mtime changed: only rebuild when the content actually changed
+        if stat.st_size == manifest.get('source_size') and file_hash(source) == manifest.get('source_hash'):
+            manifest['source_mtime'] = stat.st_mtime
+            _write_manifest(name, manifest)
+            return True
+        return False
+
+
+# Serve a source file through its snapshot, rebuilding with loader() when the source changed
+def snapshot(name, source, loader, columns=None):
+    with snapshot_lock(name):
+        if not is_fresh(name, source):
+            write_snapshot(name, loader(), source=source)
+    return read_snapshot(name, columns=columns)
+
+
+# Version string of a snapshot, used to key downstream caches
+def snapshot_version(name):
+    manifest = read_manifest(name)
+    return manifest['version'] if manifest else None
@@ -0,0 +1,123 @@
+# Python libraries
+import os
+import sys
+import time
+import argparse
+import threading
+
+# Local imports
+from wofofiles.df_src import dataset_names, refresh_dataset
+
+
+# Seconds between two warm-up runs; MEERKAT_WARMUP_SECONDS=0 disables the in-process scheduler
+warmup_interval_seconds = int(os.environ.get('MEERKAT_WARMUP_SECONDS', 900))
+
+# Datasets kept warm: the ones behind the reports. Others (e.g. ownership from RDS) stay lazy
+warmup_datasets = os.environ.get('MEERKAT_WARMUP_DATASETS', 'daily_cube,returns_report').split(',')
+
+# Extra warm-up jobs, e.g. report aggregates registered by the report modules
+_warmers = {}
+
+# name -> {'last_refresh', 'seconds', 'error'} of the last run of each dataset or warmer
+_history = {}
+_history_lock = threading.Lock()
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Register a function that recomputes some cached results after the datasets are refreshed
+def register_warmer(name):
+    def decorator(func):
+        _warmers[name] = func
+        return func
+    return decorator
+
+
+def _timed(name, func):
+    start = time.perf_counter()
+    error = None
+    try:
+        func()
+    except Exception as e:
+        error = str(e)
+    with _history_lock:
+        _history[name] = {'last_refresh': time.time(), 'seconds': time.perf_counter() - start, 'error': error}
+    return error is None
+
+
+# Refresh the datasets one after another (default: warmup_datasets), then run the warmers
+def warm_once(names=None, warmers=True):
+    for name in names or warmup_datasets:
+        _timed(f"dataset:{name}", lambda name=name: refresh_dataset(name)['future'].result())
+    if warmers:
+        for name, func in list(_warmers.items()):
+            _timed(f"warmer:{name}", func)
+
+
+# Last refresh time, duration and error of every dataset and warmer
+def warmup_status():
+    with _history_lock:
+        return {name: dict(entry) for name, entry in _history.items()}
+
+
+def _run(interval, stop, setup):
+    if setup is not None:
+        # e.g. importing the report modules, so their warmers are registered before the first run
+        _timed("setup", setup)
+    while not stop.is_set():
+        warm_once()
+        stop.wait(interval)
+
+
+# Start the warm-up loop in a daemon thread, once per process; setup runs first on that thread
+def start_scheduler(interval=None, setup=None):
+    global _scheduler
+    interval = warmup_interval_seconds if interval is None else interval
+    if interval <= 0:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            stop = threading.Event()
+            thread = threading.Thread(target=_run, args=(interval, stop, setup), name='warmup', daemon=True)
+            thread.start()
+            _scheduler = (thread, stop)
+        return _scheduler
+
+
+def stop_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler[1].set()
+            _scheduler = None
+
+
+# Run next to app.py: python -m wofofiles.warmup [--once] [--interval 900] [dataset ...]
+# a separate process refreshes the snapshots on disk; report aggregates are warmed by the app's own scheduler
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh df_src datasets and their snapshots on a schedule.")
+    parser.add_argument('datasets', nargs='*', help=f"datasets to refresh (default: {','.join(warmup_datasets)})")
+    parser.add_argument('--interval', type=int, default=warmup_interval_seconds, help="seconds between runs")
+    parser.add_argument('--once', action='store_true', help="refresh once and exit")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.datasets if name not in dataset_names()]
+    if unknown:
+        print(f"Unknown datasets: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    while True:
+        warm_once(args.datasets, warmers=False)
+        failed = False
+        for name, entry in warmup_status().items():
+            status = f"failed: {entry['error']}" if entry['error'] else "ok"
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['last_refresh']))} "
+                  f"{name} {entry['seconds']:.1f}s {status}")
+            failed = failed or bool(entry['error'])
+        if args.once:
+            return 1 if failed else 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())